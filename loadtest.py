@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# throughput benchmark of Client against local FakeServer, no apple quota is used
+# example: ./loadtest.py --latency 0.05 --error429 0.05 --concurrency 1 4 8
+
+import time
+import json
+import logging
+import argparse
+import tempfile
+import statistics
+import pyappstoreconnect
+
+# init logger
+logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler()])
+logger = logging.getLogger(__name__)
+logging.getLogger('pyappstoreconnect').setLevel(logging.CRITICAL)
+
+# retry settings for benchmark, backoff is reduced to keep runs short
+RETRY_SETTINGS = {
+    'none': {
+        'requestsRetry': False,
+    },
+    'inline': {
+        'requestsRetry': True,
+        'requestsRetrySettings': {
+            'total': 4,
+            'backoff_factor': 0.1,
+            'status_forcelist': [429, 500, 502, 503, 504],
+            'allowed_methods': ['HEAD', 'TRACE', 'GET', 'PUT', 'OPTIONS', 'POST'],
+        },
+    },
+    'deferred': {
+        'requestsRetry': True,
+        'deferRetries': True,
+    },
+}
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q-1]
+
+def sweep(client, appleIds, concurrency):
+    """
+    full appAnalytics + benchmarks sweep, returns list of results
+    """
+    results = list()
+    for appleId in appleIds:
+        for item in client.appAnalytics(appleId, days=28, groupsByMap={ 'pageViewUnique': 'source', 'units': 'storefront', 'proceeds': 'storefront' }, concurrency=concurrency):
+            results.append(item['result'])
+        for item in client.benchmarks(appleId, concurrency=concurrency):
+            results.append(item['result'])
+    return results
+
+def run(server, appleIds, concurrency, retryName, cacheDirPath):
+    kwargs = dict(RETRY_SETTINGS[retryName])
+    client = pyappstoreconnect.Client(
+        cacheDirPath=cacheDirPath,
+        appStoreConnectUrl=server.url,
+        idmsaUrl=server.url,
+        **kwargs,
+    )
+    client.retryQueue = pyappstoreconnect.RetryQueue(backoffFactor=0.1, maxBackoff=2)
+    client.login('loadtest', 'loadtest')
+    server.resetStats()
+
+    startTime = time.monotonic()
+    results = sweep(client, appleIds, concurrency)
+    wallTime = time.monotonic() - startTime
+
+    latencies = [ result.latency for result in results if result.source == 'network' ]
+    return {
+        'concurrency': concurrency,
+        'retry': retryName,
+        'units': len(results),
+        'failed': sum(1 for result in results if not result.ok),
+        'requests': server.stats['requests'],
+        'statuses': server.stats['statuses'],
+        'wallTime': round(wallTime, 3),
+        'requestsPerSecond': round(server.stats['requests'] / wallTime, 1) if wallTime else 0.0,
+        'latencyP50': round(percentile(latencies, 50), 4),
+        'latencyP99': round(percentile(latencies, 99), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Client throughput benchmark against local FakeServer')
+    parser.add_argument('--apps', type=int, default=2, help='number of apps in sweep')
+    parser.add_argument('--latency', type=float, default=0.02, help='mean server latency, seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='random latency addition, seconds')
+    parser.add_argument('--rate-limit', type=float, default=None, help='server side requests per second, others get 429')
+    parser.add_argument('--error429', type=float, default=0.05, help='probability of 429 response')
+    parser.add_argument('--error5xx', type=float, default=0.02, help='probability of 5xx response')
+    parser.add_argument('--retry-after', type=int, default=0, help='Retry-After header value, seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--retry', nargs='+', default=list(RETRY_SETTINGS), choices=list(RETRY_SETTINGS))
+    parser.add_argument('--json', action='store_true', help='print results as json')
+    args = parser.parse_args()
+
+    config = pyappstoreconnect.FakeServerConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        rateLimit=args.rate_limit,
+        error429Rate=args.error429,
+        error5xxRate=args.error5xx,
+        retryAfter=args.retry_after,
+        seed=1,
+    )
+    appleIds = [ str(1000000000 + i) for i in range(args.apps) ]
+    reports = list()
+    with pyappstoreconnect.FakeServer(config) as server, tempfile.TemporaryDirectory() as cacheDirPath:
+        for retryName in args.retry:
+            for concurrency in args.concurrency:
+                report = run(server, appleIds, concurrency, retryName, cacheDirPath)
+                reports.append(report)
+                if not args.json:
+                    logger.info(f"retry={report['retry']:8} concurrency={report['concurrency']:2} units={report['units']} failed={report['failed']} requests={report['requests']} wall={report['wallTime']}s rps={report['requestsPerSecond']} p50={report['latencyP50']}s p99={report['latencyP99']}s")
+    if args.json:
+        print(json.dumps(reports, indent=4))
+
+## run benchmark:
+if __name__ == "__main__":
+    main()
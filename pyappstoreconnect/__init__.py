@@ -1 +1,15 @@
 from .client import Client
+from .results import Result, RetryQueue
+from .rollups import RollupEngine, rollupResponse, isDerivable
+from .frame import AnalyticsFrame, to_frame
+from .clientPool import ClientPool
+from .warehouse import Warehouse
+from .snapshots import SnapshotStore
+from .seriesCache import SeriesCache, writeSeriesCache
+from .rateLimiter import RateLimiter, RequestBudget
+from .scheduler import Scheduler
+from .distributed import Coordinator, Worker, LeaseTable, planUnits, runWorkers
+from .fakeServer import FakeServer, FakeServerConfig, FakeSession
+from .profiling import Profiler
+from .queryService import QueryService
+from .pipeline import FlattenPipeline, flattenResponse
@@ -1,13 +1,32 @@
-import inspect
+import os
 import json
+import time
+import inspect
+import hashlib
+import datetime
+import contextvars
+import concurrent.futures
+
+from .series import parseDate
+from .results import Result
 
 class AcquisitionMixin:
-    def sourcesList(self, adamId, measures, startTime, endTime, frequency, dimension, apiVersion='v1'):
+    def sourcesListResult(self, adamId, measures, startTime, endTime, frequency, dimension, apiVersion='v1', limit=1, offset=None):
         """
-        https://appstoreconnect.apple.com/analytics/app/xx/yy/acquisition
+        same as sourcesList, but returns Result object with status, error class, latency and attempts
         """
 
-        defName = inspect.stack()[0][3]
+        settings = {
+            'adamId': adamId,
+            'measures': measures,
+            'startTime': startTime,
+            'endTime': endTime,
+            'frequency': frequency,
+            'dimension': dimension,
+            'apiVersion': apiVersion,
+            'limit': limit,
+            'offset': offset,
+        }
         if not isinstance(adamId, list):
             adamId = [adamId]
         if not isinstance(measures, list):
@@ -20,33 +39,23 @@ class AcquisitionMixin:
             "frequency": frequency,
             "startTime": startTime,
             "endTime": endTime,
-            "limit": 1,
+            "limit": limit,
         }
-        headers = {
-            "X-Requested-By": "appstoreconnect.apple.com",
-        }
-        url=f"https://appstoreconnect.apple.com/analytics/api/{apiVersion}/data/sources/list"
-        self.logger.debug(f"{defName}: payload={json.dumps(payload)}")
-        response = self.session.post(url, json=payload, headers=headers)
-
-        # check status_code
-        if response.status_code != 200:
-            self.logger.error(f"{defName}: status_code={response.status_code}, payload={payload}, response.text={response.text}")
-            return False
+        if offset is not None:
+            payload['offset'] = offset
+        url=f"{self.appStoreConnectUrl}/analytics/api/{apiVersion}/data/sources/list"
+        return self.postResult('sourcesList', url, payload, settings)
 
-        # check json data
-        try:
-            data = response.json()
-        except Exception as e:
-            self.logger.error(f"{defName}: failed get response.json(), error={str(e)}")
-            return None
-
-        # check results
-        if 'results' not in data:
-            self.logger.error(f"{defName}: 'results' not found in response.json()={data}")
-            return False
+    def sourcesList(self, adamId, measures, startTime, endTime, frequency, dimension, apiVersion='v1', limit=1, offset=None):
+        """
+        https://appstoreconnect.apple.com/analytics/app/xx/yy/acquisition
+        returns response.json() on success, None if response is not json, False on other errors
+        """
 
-        return data
+        result = self.sourcesListResult(adamId, measures, startTime, endTime, frequency, dimension, apiVersion=apiVersion, limit=limit, offset=offset)
+        if result.status == 'networkError':
+            raise result.exception
+        return result.legacyResponse()
 
     def acquisition(self, appleId, days=7, startTime=None, endTime=None):
         """
@@ -85,5 +94,103 @@ class AcquisitionMixin:
             'measures': ['impressionsTotal','totalDownloads','proceeds','sessions'],
         }
         self.logger.debug(f"{defName}: args='{args}'")
-        response = self.sourcesList(**args)
-        return { 'settings': args, 'response': response }
+        # settings of item are args, not defaults of sourcesListResult
+        return self.resultItem(self.sourcesListResult(**args), extra={ 'settings': args })
+
+    def _sourcesPage(self, settings, cacheFile):
+        """
+        one page of sources list, closed windows are read from and written to cache file
+        retryable failures (429, 5xx, network) are retried with delay of client.retryQueue (Retry-After or backoff)
+        until retryQueue.maxAttempts, pages are needed in order, so they are not deferred to end of sweep
+        """
+
+        defName = inspect.stack()[0][3]
+        if cacheFile and os.path.exists(cacheFile) and os.path.getsize(cacheFile) > 0:
+            with open(cacheFile, 'r') as f:
+                return self.resultItem(Result('sourcesList', settings, 'ok', response=json.load(f), attempts=0, source='local'))
+        result = self.sourcesListResult(**settings)
+        attempts = result.attempts
+        while result.retryable and attempts < self.retryQueue.maxAttempts:
+            delay = self.retryQueue.delay(result)
+            self.logger.warning(f"{defName}: retry in {delay:.1f}s, offset={settings.get('offset')}, result={result}")
+            time.sleep(delay)
+            result = self.sourcesListResult(**settings)
+            attempts += result.attempts
+            result.attempts = attempts
+        item = self.resultItem(result)
+        if cacheFile and item['result'].ok:
+            with open(cacheFile, 'w') as f:
+                json.dump(item['response'], f)
+        return item
+
+    def iterSources(self, appleId, dimensions='campaignId', measures=['impressionsTotal','totalDownloads','proceeds','sessions'], days=7, startTime=None, endTime=None, frequency='day', pageSize=50, concurrency=4, closedAfterDays=3):
+        """
+        stream all rows of data/sources/list page by page, returns iterable object with items:
+            { 'dimension': ..., 'page': ..., 'row': ..., 'settings': ..., 'result': ... }
+        dimensions - source dimension or list of dimensions: campaignId, etc...
+        pages are fetched concurrently (requests are limited by client.rateLimiter),
+        paging stops at first page with less than pageSize rows, page which still fails after retries ends stream
+        of dimension with item where row is None
+        note: 'offset' is not documented by Apple, paging assumes that api honours it together with 'limit'
+        windows which ended more than closedAfterDays ago are closed (data will not change) and cached in cacheDirPath
+        """
+
+        defName = inspect.stack()[0][3]
+        if not isinstance(dimensions, list):
+            dimensions = [dimensions]
+        # set default time interval
+        if not startTime and not endTime:
+            timeInterval = self.timeInterval(days)
+            startTime = timeInterval['startTime']
+            endTime = timeInterval['endTime']
+
+        closed = parseDate(endTime) <= datetime.date.today() - datetime.timedelta(days=closedAfterDays)
+        cacheDir = os.path.join(self.cacheDirPath, 'sources')
+        if closed:
+            os.makedirs(cacheDir, exist_ok=True)
+
+        for dimension in dimensions:
+            def pageSettings(page):
+                return {
+                    'adamId': appleId,
+                    'measures': measures,
+                    'startTime': startTime,
+                    'endTime': endTime,
+                    'frequency': frequency,
+                    'dimension': dimension,
+                    'limit': pageSize,
+                    'offset': page * pageSize,
+                }
+            def pageCacheFile(settings):
+                if not closed:
+                    return None
+                return os.path.join(cacheDir, hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()+'.json')
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+                futures = dict()
+                nextPage = 0
+                page = 0
+                lastPage = None
+                while lastPage is None or page <= lastPage:
+                    # keep concurrency pages in flight until last page is known {{
+                    while lastPage is None and len(futures) < max(concurrency, 1):
+                        settings = pageSettings(nextPage)
+                        futures[nextPage] = executor.submit(contextvars.copy_context().run, self._sourcesPage, settings, pageCacheFile(settings))
+                        nextPage += 1
+                    # }}
+                    item = futures.pop(page).result()
+                    if not item['result'].ok:
+                        self.logger.error(f"{defName}: failed get page={page}, dimension={dimension}, result={item['result']}")
+                        yield { 'dimension': dimension, 'page': page, 'row': None, 'settings': item['settings'], 'result': item['result'] }
+                        lastPage = page
+                        break
+                    rows = item['response']['results']
+                    self.logger.debug(f"{defName}: dimension={dimension}, page={page}, rows={len(rows)}, source={item['result'].source}")
+                    for row in rows:
+                        yield { 'dimension': dimension, 'page': page, 'row': row, 'settings': item['settings'], 'result': item['result'] }
+                    if len(rows) < pageSize:
+                        lastPage = page
+                    page += 1
+                # pages requested after last page are not needed
+                for future in futures.values():
+                    future.cancel()
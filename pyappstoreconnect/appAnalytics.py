@@ -1,7 +1,7 @@
 import inspect
 
 class AppAnalyticsMixin:
-    def appAnalytics(self, appleId, days=7, startTime=None, endTime=None, groupsByMap=dict()):
+    def appAnalytics(self, appleId, days=7, startTime=None, endTime=None, groupsByMap=dict(), concurrency=1):
         """
         https://github.com/fastlane/fastlane/blob/master/spaceship/lib/spaceship/tunes/app_analytics.rb
         returns iterable object
@@ -14,6 +14,7 @@ class AppAnalyticsMixin:
                     "pageViewUnique": "source",
                     "updates": "storefront",
                 }
+        concurrency - number of requests sent at once, results are yielded in the same order
         """
 
         defName = inspect.stack()[0][3]
@@ -95,50 +96,55 @@ class AppAnalyticsMixin:
         }
 
 
-        for metric in metrics:
-            settings = defaultSettings.copy()
-            if not 'measures' in settings:
-                settings['measures'] = metric
-            # metrics grouping by date {{
-            response = self.timeSeriesAnalytics(**settings)
-            yield { 'settings': settings, 'response': response }
-            # }}
+        def units():
+            for metric in metrics:
+                settings = defaultSettings.copy()
+                if not 'measures' in settings:
+                    settings['measures'] = metric
+                # metrics grouping by date {{
+                yield dict(settings)
+                # }}
 
-            # metrics with grouping {{
-            if groupsByMap:
-                # if set, get groups by static maps
-                for _metric,_group in groupsByMap.items():
-                    if _metric != metric:
-                        continue
-                    if _metric not in metrics:
-                        self.logger.warning(f"{defName}: invalid pair='{_metric}':'{_group}' in groupsByMap, metric not in available metrics list")
-                        continue
-                    if _group not in groups:
-                        self.logger.warning(f"{defName}: invalid pair='{_metric}':'{_group}' in groupsByMap, group not in available groups list")
-                        continue
-                    if _metric in invalidMeasureDimensionCombination.keys() and _group in invalidMeasureDimensionCombination[_metric]:
-                        self.logger.warning(f"{defName}: invalid pair='{_metric}':'{_group}' in groupsByMap, invalid measure-dimension combination")
-                        # skip if we have invalid measure-dimension combination
-                        continue
-                    _groupSettings = groupsDefaultSettings.copy()
-                    _groupSettings['metric'] = settings['measures']
-                    _groupSettings['dimension'] = _group
-                    settings['group'] = _groupSettings
-                    response = self.timeSeriesAnalytics(**settings)
-                    yield { 'settings': settings, 'response': response }
+                # metrics with grouping {{
+                if groupsByMap:
+                    # if set, get groups by static maps
+                    for _metric,_group in groupsByMap.items():
+                        if _metric != metric:
+                            continue
+                        if _metric not in metrics:
+                            self.logger.warning(f"{defName}: invalid pair='{_metric}':'{_group}' in groupsByMap, metric not in available metrics list")
+                            continue
+                        if _group not in groups:
+                            self.logger.warning(f"{defName}: invalid pair='{_metric}':'{_group}' in groupsByMap, group not in available groups list")
+                            continue
+                        if _metric in invalidMeasureDimensionCombination.keys() and _group in invalidMeasureDimensionCombination[_metric]:
+                            self.logger.warning(f"{defName}: invalid pair='{_metric}':'{_group}' in groupsByMap, invalid measure-dimension combination")
+                            # skip if we have invalid measure-dimension combination
+                            continue
+                        _groupSettings = groupsDefaultSettings.copy()
+                        _groupSettings['metric'] = settings['measures']
+                        _groupSettings['dimension'] = _group
+                        settings['group'] = _groupSettings
+                        yield dict(settings)
 
-            else:
-                # else, get all groups for all metrics
-                # WARNING: most likely you will get rate limit
-                for group in groups:
-                    if metric in invalidMeasureDimensionCombination.keys() and group in invalidMeasureDimensionCombination[metric]:
-                        self.logger.debug(f"{defName}: skipping invalid measure-dimension combination: metric={metric}, group={group}")
-                        # skip if we have invalid measure-dimension combination
-                        continue
-                    _groupSettings = groupsDefaultSettings.copy()
-                    _groupSettings['metric'] = settings['measures']
-                    _groupSettings['dimension'] = group
-                    settings['group'] = _groupSettings
-                    response = self.timeSeriesAnalytics(**settings)
-                    yield { 'settings': settings, 'response': response }
-            # }}
+                else:
+                    # else, get all groups for all metrics
+                    # WARNING: most likely you will get rate limit
+                    for group in groups:
+                        if metric in invalidMeasureDimensionCombination.keys() and group in invalidMeasureDimensionCombination[metric]:
+                            self.logger.debug(f"{defName}: skipping invalid measure-dimension combination: metric={metric}, group={group}")
+                            # skip if we have invalid measure-dimension combination
+                            continue
+                        _groupSettings = groupsDefaultSettings.copy()
+                        _groupSettings['metric'] = settings['measures']
+                        _groupSettings['dimension'] = group
+                        settings['group'] = _groupSettings
+                        yield dict(settings)
+                # }}
+
+        queue = self.newRetryQueue()
+        yield from self.fetchMany(units(), concurrency=concurrency, queue=queue)
+
+        # retry deferred units at the end of sweep
+        yield from self.drainRetryQueue(queue)
+        self.endSweep()
@@ -5,12 +5,47 @@ class BenchmarksMixin:
     available category:
         ProductivityApp - "Productivity App" This peer set includes apps in the Productivity category on the App Store.
         AllCategories   - "All Categories" This peer set includes apps in all categories on the App Store.
+    custom peer group is list of peerGroupId option keys, example: ["184", "56", "14"]
     """
 
-    def benchmarks(self, appleId, days=182, startTime=None, endTime=None, category="AllCategories", optionKeys=None):
+    # category: peerGroupId option keys
+    benchmarkCategories = {
+        'AllCategories': ["6", "3", "2"],
+        'ProductivityApp': ["184", "56", "14"],
+    }
+    # own measure: peer group measure
+    benchmarkMeasures = {
+        'conversionRate': 'benchConversionRate',
+        'crashRate': 'benchCrashRate',
+        'retentionD1': 'benchRetentionD1',
+        'retentionD7': 'benchRetentionD7',
+        'retentionD28': 'benchRetentionD28',
+    }
+
+    def benchmarkOptionKeys(self, category):
+        """
+        (name, optionKeys) of category name or list of peerGroupId option keys
+        """
+
+        defName = inspect.stack()[0][3]
+        if isinstance(category, (list, tuple)):
+            optionKeys = [ str(optionKey) for optionKey in category ]
+            return ','.join(optionKeys), optionKeys
+        if category in self.benchmarkCategories:
+            return category, list(self.benchmarkCategories[category])
+        message = f"unsupported category='{category}'"
+        self.logger.error(f"{defName}: {message}")
+        raise Exception(message)
+
+    def benchmarks(self, appleId, days=182, startTime=None, endTime=None, category="AllCategories", optionKeys=None, concurrency=1):
         """
         benchmarks
         default intervals: 4 weeks, 12 weeks, 26 weeks (182 days)
+        category - category name, list of peerGroupId option keys or list of them, example:
+            category=['AllCategories', 'ProductivityApp', ["6", "3", "2"]]
+        own measures are requested once for all categories, every item has 'category' key:
+        category name (option keys joined by ',' for custom peer groups) for bench* measures and None for own measures
+        concurrency - number of requests sent at once, results are yielded in the same order
         """
 
         defName = inspect.stack()[0][3]
@@ -19,17 +54,13 @@ class BenchmarksMixin:
         if optionKeys:
             message = f"deprecated argument 'optionKeys'"
             self.logger.error(f"{defName}: {message}")
-            raise message
+            raise Exception(message)
 
-        # convert category to optionKeys
-        if category == 'AllCategories':
-            optionKeys = ["6", "3", "2"]
-        elif category == 'ProductivityApp':
-            optionKeys = ["184", "56", "14"]
+        # convert categories to optionKeys
+        if isinstance(category, (list, tuple)) and category and all(isinstance(_category, str) and not _category.isdigit() or isinstance(_category, (list, tuple)) for _category in category):
+            categories = [ self.benchmarkOptionKeys(_category) for _category in category ]
         else:
-            message = f"unsupported category='{category}'"
-            self.logger.error(f"{defName}: {message}")
-            raise message
+            categories = [ self.benchmarkOptionKeys(category) ]
 
         # set default time interval
         if not startTime and not endTime:
@@ -37,78 +68,55 @@ class BenchmarksMixin:
             startTime = timeInterval['startTime']
             endTime = timeInterval['endTime']
 
-        metrics = {
-            # conversionRate {{
-            'benchConversionRate': {
-                'dimensionFilters': [
-                    {
-                        'dimensionKey': 'peerGroupId',
-                        'optionKeys': optionKeys,
-                    }
-                ],
-            },
-            'conversionRate': {},
-            # }}
-            # crashRate {{
-            'benchCrashRate': {
-                'dimensionFilters': [
-                    {
-                        'dimensionKey': 'peerGroupId',
-                        'optionKeys': optionKeys,
-                    }
-                ],
-            },
-            'crashRate': {},
-            # }}
-            # retentionD1 {{
-            'benchRetentionD1': {
-                'dimensionFilters': [
-                    {
-                        'dimensionKey': 'peerGroupId',
-                        'optionKeys': optionKeys,
-                    }
-                ],
-            },
-            'retentionD1': {},
-            # }}
-            # retentionD7 {{
-            'benchRetentionD7': {
-                'dimensionFilters': [
-                    {
-                        'dimensionKey': 'peerGroupId',
-                        'optionKeys': optionKeys,
-                    }
-                ],
-            },
-            'retentionD7': {},
-            # }}
-            # retentionD28 {{
-            'benchRetentionD28': {
-                'dimensionFilters': [
-                    {
-                        'dimensionKey': 'peerGroupId',
-                        'optionKeys': optionKeys,
-                    }
-                ],
-            },
-            'retentionD28': {},
-            # }}
-        }
-
         defaultSettings = {
             'adamId': appleId,
             'startTime': startTime,
             'endTime': endTime,
             'frequency': 'week',
             'group': None,
+            'dimensionFilters': list(),
             'apiVersion': 'v2',
         }
 
-        for metric,settings in metrics.items():
-            args = defaultSettings.copy()
-            args.update(settings)
-            if not 'measures' in args:
-                args['measures'] = metric
-            self.logger.debug(f"{defName}: args='{args}'")
-            response = self.timeSeriesAnalytics(**args)
-            yield { 'settings': args, 'response': response }
+        def units():
+            # own measures {{
+            for metric in self.benchmarkMeasures:
+                args = dict(defaultSettings, measures=metric)
+                self.logger.debug(f"{defName}: args='{args}'")
+                yield args, { 'category': None }
+            # }}
+            # peer group measures {{
+            for name,_optionKeys in categories:
+                for metric in self.benchmarkMeasures.values():
+                    args = dict(defaultSettings, measures=metric, dimensionFilters=[
+                        {
+                            'dimensionKey': 'peerGroupId',
+                            'optionKeys': _optionKeys,
+                        }
+                    ])
+                    self.logger.debug(f"{defName}: args='{args}'")
+                    yield args, { 'category': name }
+            # }}
+
+        queue = self.newRetryQueue()
+        yield from self.fetchMany(units(), concurrency=concurrency, queue=queue)
+
+        # retry deferred units at the end of sweep
+        yield from self.drainRetryQueue(queue)
+        self.endSweep()
+
+    def benchmarksByCategory(self, appleId, days=182, startTime=None, endTime=None, categories=["AllCategories"], concurrency=8):
+        """
+        same as benchmarks for list of categories, returns dict:
+        { category: { measure: item } } with own measures and bench* measures of category
+        """
+
+        categories = [ _category if isinstance(_category, str) else list(_category) for _category in categories ]
+        own = dict()
+        bench = { self.benchmarkOptionKeys(_category)[0]: dict() for _category in categories }
+        for item in self.benchmarks(appleId, days=days, startTime=startTime, endTime=endTime, category=categories, concurrency=concurrency):
+            if item['category'] is None:
+                own[item['settings']['measures']] = item
+            else:
+                bench[item['category']][item['settings']['measures']] = item
+        return { name: dict(own, **items) for name,items in bench.items() }
@@ -8,11 +8,18 @@ import json
 import datetime
 import hashlib
 import pickle
+import atexit
 import re
 import sirp
 import base64
 import binascii
 
+from .results import ResultsMixin, RetryQueue
+from .rollups import RollupEngine
+from .rateLimiter import RateLimiter
+from .warehouse import Warehouse
+from .snapshots import SnapshotStore
+from .seriesCache import SeriesCache
 from .settings import SettingsMixin
 from .timeSeriesAnalytics import TimeSeriesAnalyticsMixin
 from .appAnalytics import AppAnalyticsMixin
@@ -20,8 +27,10 @@ from .benchmarks import BenchmarksMixin
 from .metricsWithFilter import MetricsWithFilterMixin
 from .metricsWithGroup import MetricsWithGroupMixin
 from .acquisition import AcquisitionMixin
+from .freshness import FreshnessMixin
 
 class Client(
+        ResultsMixin,
         SettingsMixin,
         TimeSeriesAnalyticsMixin,
         AppAnalyticsMixin,
@@ -29,6 +38,7 @@ class Client(
         MetricsWithFilterMixin,
         MetricsWithGroupMixin,
         AcquisitionMixin,
+        FreshnessMixin,
     ):
     """
     client for connect to appstoreconnect.apple.com
@@ -41,6 +51,22 @@ responses = client.appAnalytics(appleId)
 for response in responses:
     print(response)
 ```
+    deferRetries - don't retry 429/5xx inline, push failed units to retry queue of sweep (settings of self.retryQueue)
+        and retry them at the end of sweep,
+        every yielded item contains 'result' with status, errorClass, latency and attempts:
+```
+client = appstoreconnect.Client(deferRetries=True)
+for item in client.appAnalytics(appleId):
+    if not item['result'].ok:
+        print(item['result'].status, item['result'].errorClass)
+```
+    rollups - derive week/month series of additive measures (units, sessions, proceeds, etc...) from
+        already fetched daily series instead of server requests, see RollupEngine
+    rateLimit - maximum analytics api requests per second for all threads of client
+    warehousePath - path of sqlite file, store all fetched data points and answer covered requests from it, see Warehouse
+    snapshotPath - path of sqlite file, keep delta compressed history of every fetched response, see SnapshotStore
+    seriesCachePath - path of memory mapped binary file with fetched series, written by client.seriesCache.flush(), see SeriesCache
+    appStoreConnectUrl, idmsaUrl - base urls of apple services, can be changed for local FakeServer
     """
 
     def __init__(self,
@@ -55,6 +81,14 @@ for response in responses:
         logLevel=None,
         userAgent=None,
         legacySignin=False,
+        deferRetries=False,
+        rollups=False,
+        rateLimit=None,
+        warehousePath=None,
+        snapshotPath=None,
+        seriesCachePath=None,
+        appStoreConnectUrl="https://appstoreconnect.apple.com",
+        idmsaUrl="https://idmsa.apple.com",
     ):
         self.logger = logging.getLogger(__name__)
         if logLevel:
@@ -91,10 +125,16 @@ for response in responses:
         self.session = requests.Session() # create a new session object
         # requests: define the retry strategy {{
         if self.requestsRetry:
-            retryStrategy = Retry(**self.requestsRetrySettings)
+            retrySettings = self.requestsRetrySettings
+            if self.deferRetries:
+                # failed statuses go to self.retryQueue instead of inline retries with backoff,
+                # urllib3 retries 413/429/503 with Retry-After header even with empty status_forcelist
+                retrySettings = dict(retrySettings, status_forcelist=[], respect_retry_after_header=False)
+            retryStrategy = Retry(**retrySettings)
             # create an http adapter with the retry strategy and mount it to session
             adapter = HTTPAdapter(max_retries=retryStrategy)
             self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
         # }}
         self.session.headers.update(self.headers)
         self.authTypes = ["hsa2"] # supported auth types
@@ -109,6 +149,32 @@ for response in responses:
         # }}
 
         self.apiSettingsAll = None
+        self.retryQueue = RetryQueue()
+        self.rateLimiter = None
+        if self.rateLimit:
+            self.rateLimiter = RateLimiter(self.rateLimit)
+        self.localSources = list() # objects with answer(settings), called before time-series requests
+        self.sinks = list() # objects with ingest(settings, response), called after successful time-series requests
+        self.rollupEngine = None
+        if self.rollups:
+            self.rollupEngine = RollupEngine()
+            self.localSources.append(self.rollupEngine)
+            self.sinks.append(self.rollupEngine)
+        self.warehouse = None
+        if self.warehousePath:
+            self.warehouse = Warehouse(self.warehousePath)
+            # buffered points of interrupted sweep
+            atexit.register(self.warehouse.close)
+            self.localSources.append(self.warehouse)
+            self.sinks.append(self.warehouse)
+        self.snapshots = None
+        if self.snapshotPath:
+            self.snapshots = SnapshotStore(self.snapshotPath)
+            self.sinks.append(self.snapshots)
+        self.seriesCache = None
+        if self.seriesCachePath:
+            self.seriesCache = SeriesCache(self.seriesCachePath)
+            self.sinks.append(self.seriesCache)
 
     def appleSessionHeaders(self):
         """
@@ -136,7 +202,7 @@ for response in responses:
             with open(cacheFile, "r") as file:
                  xWidgetKey = file.read()
         else:
-            response = requests.get("https://appstoreconnect.apple.com/olympus/v1/app/config", params={ "hostname": "itunesconnect.apple.com" })
+            response = requests.get(f"{self.appStoreConnectUrl}/olympus/v1/app/config", params={ "hostname": "itunesconnect.apple.com" })
             try:
                 data = response.json()
             except Exception as e:
@@ -156,7 +222,7 @@ for response in responses:
         """
 
         defName = inspect.stack()[0][3]
-        response = requests.get(f"https://idmsa.apple.com/appleauth/auth/signin?widgetKey={self.xWidgetKey}")
+        response = requests.get(f"{self.idmsaUrl}/appleauth/auth/signin?widgetKey={self.xWidgetKey}")
         headers = response.headers
         bits = headers["X-Apple-HC-Bits"]
         challenge = headers["X-Apple-HC-Challenge"]
@@ -185,7 +251,7 @@ for response in responses:
 
         headers = self.appleSessionHeaders()
 
-        r = self.session.get("https://idmsa.apple.com/appleauth/auth", headers=headers)
+        r = self.session.get(f"{self.idmsaUrl}/appleauth/auth", headers=headers)
         self.logger.debug(f"def={defName}: response.status_code={r.status_code}")
         if r.status_code == 201:
             # success
@@ -244,7 +310,7 @@ for response in responses:
             "mode": pushMode,
         }
         headers = self.appleSessionHeaders()
-        r = self.session.post(f"https://idmsa.apple.com/appleauth/auth/verify/{codeType}/securitycode", json=payload, headers=headers)
+        r = self.session.post(f"{self.idmsaUrl}/appleauth/auth/verify/{codeType}/securitycode", json=payload, headers=headers)
         self.logger.debug(f"def={defName}: response.status_code={r.status_code}")
         self.logger.debug(f"def={defName}: response.json()={json.dumps(r.json())}")
 
@@ -256,7 +322,7 @@ for response in responses:
 
     def storeSession(self):
         headers = self.appleSessionHeaders()
-        r = self.session.get(f"https://idmsa.apple.com/appleauth/auth/2sv/trust", headers=headers)
+        r = self.session.get(f"{self.idmsaUrl}/appleauth/auth/2sv/trust", headers=headers)
         with open(self.sessionCacheFile, 'wb') as f:
             pickle.dump(self.session.cookies, f)
 
@@ -275,7 +341,7 @@ for response in responses:
         a = client.start_authentication()
 
         # init request {{
-        url = "https://idmsa.apple.com/appleauth/auth/signin/init"
+        url = f"{self.idmsaUrl}/appleauth/auth/signin/init"
         payload = {
             "a": base64.b64encode(self.to_byte(a)).decode('utf-8'),
             "accountName": username,
@@ -319,7 +385,7 @@ for response in responses:
             raise Exception('Error processing SIRP challenge')
 
         # complete request {{
-        url = "https://idmsa.apple.com/appleauth/auth/signin/complete"
+        url = f"{self.idmsaUrl}/appleauth/auth/signin/complete"
         payload = {
             'accountName': username,
             'c': c,
@@ -369,7 +435,7 @@ for response in responses:
     def _legacySignin(self,username,password):
         defName = inspect.stack()[0][3]
 
-        url = "https://idmsa.apple.com/appleauth/auth/signin"
+        url = f"{self.idmsaUrl}/appleauth/auth/signin"
         headers = self.headers
         payload = {
             "accountName": username,
@@ -0,0 +1,202 @@
+import os
+import queue
+import inspect
+import logging
+import threading
+
+from .client import Client
+
+class ClientPool:
+    """
+    pool of authenticated clients for several developer accounts
+    every account has own client with own cache dir, requests session and rate limit budget,
+    apps are mapped to accounts which can read them and work is spread across these accounts
+    by observed rate limiting (429 responses and inline retries) and number of running jobs
+    usage:
+```
+pool = pyappstoreconnect.ClientPool(cacheDirPath='./cache')
+pool.addAccount('main', username=username1, password=password1, apps=[appleId1, appleId2])
+pool.addAccount('second', username=username2, password=password2)
+pool.discoverApps([appleId3]) # probe accounts which can read app
+for item in pool.map([appleId1, appleId2, appleId3], 'appAnalytics', groupsByMap={"pageViewUnique":"source"}):
+    print(item['account'], item['settings'], item['response'])
+```
+    """
+
+    def __init__(self, cacheDirPath="./cache", rateLimitedPenalty=10.0, ewmaAlpha=0.2, **clientKwargs):
+        self.logger = logging.getLogger(__name__)
+        self.cacheDirPath = cacheDirPath
+        self.rateLimitedPenalty = rateLimitedPenalty
+        self.ewmaAlpha = ewmaAlpha
+        self.clientKwargs = clientKwargs
+        self.accounts = dict()
+        self.lock = threading.Lock()
+
+    def addAccount(self, name, username=None, password=None, apps=None, client=None, **clientKwargs):
+        """
+        add account to pool, client is created with cache dir cacheDirPath/name and logged in if username is set
+        """
+
+        defName = inspect.stack()[0][3]
+        if client is None:
+            kwargs = dict(self.clientKwargs, **clientKwargs)
+            kwargs.setdefault('cacheDirPath', os.path.join(self.cacheDirPath, name))
+            client = Client(**kwargs)
+            if username:
+                response = client.login(username=username, password=password)
+                if not response:
+                    message = f"login failed for account='{name}'"
+                    self.logger.error(f"{defName}: {message}")
+                    raise Exception(message)
+        self.accounts[name] = {
+            'client': client,
+            'apps': set(str(appleId) for appleId in (apps or list())),
+            'stats': {
+                'jobs': 0,
+                'running': 0,
+                'requests': 0,
+                'rateLimited': 0,
+                'rateLimitedRate': 0.0,
+            },
+        }
+        return client
+
+    def assign(self, appleId, accounts):
+        """
+        map app to accounts which can read it
+        """
+        for name in accounts:
+            self.accounts[name]['apps'].add(str(appleId))
+
+    def discoverApps(self, appleIds, measure='units'):
+        """
+        map apps to accounts with one minimal request per app and account (last day of single measure)
+        """
+
+        defName = inspect.stack()[0][3]
+        for appleId in appleIds:
+            for name, account in self.accounts.items():
+                if str(appleId) in account['apps']:
+                    continue
+                client = account['client']
+                timeInterval = client.timeInterval(1)
+                result = client.timeSeriesAnalyticsResult(appleId, measure, timeInterval['startTime'], timeInterval['endTime'], 'day')
+                self.record(name, result)
+                if result.ok:
+                    account['apps'].add(str(appleId))
+                self.logger.debug(f"{defName}: appleId={appleId}, account={name}, status={result.status}")
+
+    def accountsFor(self, appleId):
+        return [ name for name, account in self.accounts.items() if str(appleId) in account['apps'] ]
+
+    def score(self, name):
+        stats = self.accounts[name]['stats']
+        return (stats['running'] + 1) * (1.0 + self.rateLimitedPenalty * stats['rateLimitedRate'])
+
+    def pick(self, appleId):
+        """
+        account with lowest load for app
+        """
+        with self.lock:
+            names = self.accountsFor(appleId)
+            if not names:
+                raise Exception(f"no account can read appleId='{appleId}', use assign() or discoverApps()")
+            name = min(names, key=self.score)
+            self.accounts[name]['stats']['running'] += 1
+            self.accounts[name]['stats']['jobs'] += 1
+            return name
+
+    def record(self, name, result):
+        """
+        update account stats by Result, inline retries are counted as rate limiting
+        """
+        if result is None or result.source != 'network':
+            return
+        with self.lock:
+            stats = self.accounts[name]['stats']
+            throttled = result.attempts - 1 + (1 if result.status == 'rateLimited' else 0)
+            stats['requests'] += result.attempts
+            stats['rateLimited'] += throttled
+            sample = min(throttled / result.attempts, 1.0)
+            stats['rateLimitedRate'] += self.ewmaAlpha * (sample - stats['rateLimitedRate'])
+
+    def run(self, appleId, method, *args, **kwargs):
+        """
+        run client method for app on least loaded account, returns iterable object with items of method plus 'account'
+        """
+        name = self.pick(appleId)
+        try:
+            items = getattr(self.accounts[name]['client'], method)(appleId, *args, **kwargs)
+            if isinstance(items, dict):
+                items = [items]
+            for item in items:
+                self.record(name, item.get('result'))
+                item['account'] = name
+                yield item
+        finally:
+            with self.lock:
+                self.accounts[name]['stats']['running'] -= 1
+
+    def map(self, appleIds, method, *args, concurrency=None, bufferSize=100, **kwargs):
+        """
+        run client method for every app concurrently across accounts, returns iterable object with items in order of arrival
+        concurrency - number of jobs running at once, default is number of accounts
+        bufferSize  - maximum number of items waiting for consumer, jobs block when buffer is full
+        """
+
+        if concurrency is None:
+            concurrency = max(len(self.accounts), 1)
+        jobs = queue.Queue()
+        for appleId in appleIds:
+            jobs.put(appleId)
+        items = queue.Queue(maxsize=bufferSize)
+        done = object()
+        # set when consumer stops iterating or map raises, workers finish their current request and exit
+        stop = threading.Event()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    items.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    appleId = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                job = self.run(appleId, method, *args, **kwargs)
+                try:
+                    for item in job:
+                        if not put(item):
+                            break
+                except Exception as e:
+                    put(e)
+                finally:
+                    # runs finally of run(), so account is not left as running
+                    job.close()
+            put(done)
+
+        threads = [ threading.Thread(target=worker, daemon=True) for _ in range(concurrency) ]
+        for thread in threads:
+            thread.start()
+        finished = 0
+        try:
+            while finished < len(threads):
+                item = items.get()
+                if item is done:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+    def stats(self):
+        with self.lock:
+            return { name: dict(account['stats'], apps=sorted(account['apps'])) for name, account in self.accounts.items() }
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import hashlib
+import inspect
+import logging
+import multiprocessing
+
+def planUnits(appleIds, measures, groups=list(), startTime=None, endTime=None, frequency='day', groupLimit=10):
+    """
+    collection plan: timeSeriesAnalytics settings for apps x measures x (no group + groups)
+    """
+    units = list()
+    for appleId in appleIds:
+        for measure in measures:
+            for group in [None] + list(groups):
+                units.append({
+                    'adamId': appleId,
+                    'measures': measure,
+                    'startTime': startTime,
+                    'endTime': endTime,
+                    'frequency': frequency,
+                    'group': None if group is None else {
+                        'metric': measure,
+                        'dimension': group,
+                        'rank': 'DESCENDING',
+                        'limit': groupLimit,
+                    },
+                })
+    return units
+
+def unitKey(unit):
+    """
+    stable hash of work unit
+    """
+    return hashlib.sha1(json.dumps(unit, sort_keys=True).encode()).hexdigest()
+
+def unitShard(unit, shards):
+    return int(unitKey(unit)[:8], 16) % shards
+
+class LeaseTable:
+    """
+    sqlite table of work units and shard leases shared by coordinator and workers on one host or shared filesystem
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS shards (
+                shard INTEGER PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                leaseExpires REAL,
+                claims INTEGER NOT NULL DEFAULT 0,
+                completed REAL
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                key TEXT PRIMARY KEY,
+                shard INTEGER NOT NULL,
+                settings TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                resultStatus TEXT,
+                response TEXT,
+                worker TEXT,
+                completed REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # lease tables created before attempts counter
+        if 'attempts' not in [ row[1] for row in self.connection.execute("PRAGMA table_info(units)") ]:
+            self.connection.execute("ALTER TABLE units ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS unitsShard ON units (shard, status)")
+
+    def transaction(self):
+        """
+        exclusive write transaction, use: with table.transaction(): ...
+        """
+        return _Transaction(self.connection)
+
+    def close(self):
+        self.connection.close()
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, excType, excValue, traceback):
+        self.connection.execute("COMMIT" if excType is None else "ROLLBACK")
+        return False
+
+class Coordinator:
+    """
+    publish collection plan sharded by stable hash of work units and watch progress
+    usage:
+```
+coordinator = pyappstoreconnect.Coordinator('./cache/leases.sqlite', shards=32)
+coordinator.publish(pyappstoreconnect.planUnits(appleIds, ['units', 'proceeds'], ['storefront'], startTime, endTime))
+pyappstoreconnect.runWorkers('./cache/leases.sqlite', clientFactory, processes=4)
+for unit in coordinator.results():
+    print(unit['settings'], unit['response'])
+```
+    """
+
+    def __init__(self, leasePath, shards=32):
+        self.logger = logging.getLogger(__name__)
+        self.table = LeaseTable(leasePath)
+        self.shards = shards
+
+    def publish(self, units):
+        """
+        add work units to lease table, already published units are kept
+        """
+        defName = inspect.stack()[0][3]
+        with self.table.transaction() as connection:
+            connection.executemany("INSERT OR IGNORE INTO shards (shard) VALUES (?)", [ (shard,) for shard in range(self.shards) ])
+            connection.executemany(
+                "INSERT OR IGNORE INTO units (key, shard, settings) VALUES (?, ?, ?)",
+                [ (unitKey(unit), unitShard(unit, self.shards), json.dumps(unit, sort_keys=True)) for unit in units ],
+            )
+            # new units reopen finished shards
+            connection.execute("UPDATE shards SET status='pending', completed=NULL WHERE status='done' AND shard IN (SELECT DISTINCT shard FROM units WHERE status='pending')")
+        self.logger.debug(f"{defName}: published units={len(units)}, shards={self.shards}")
+
+    def progress(self):
+        connection = self.table.connection
+        return {
+            'units': dict(connection.execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall()),
+            'shards': dict(connection.execute("SELECT status, COUNT(*) FROM shards GROUP BY status").fetchall()),
+            'expiredLeases': connection.execute("SELECT COUNT(*) FROM shards WHERE status='running' AND leaseExpires < ?", (time.time(),)).fetchone()[0],
+        }
+
+    def done(self):
+        return self.table.connection.execute("SELECT COUNT(*) FROM shards WHERE status!='done'").fetchone()[0] == 0
+
+    def results(self):
+        for settings, status, resultStatus, response, worker in self.table.connection.execute("SELECT settings, status, resultStatus, response, worker FROM units ORDER BY shard, key"):
+            yield {
+                'settings': json.loads(settings),
+                'status': status,
+                'resultStatus': resultStatus,
+                'response': json.loads(response) if response else None,
+                'worker': worker,
+            }
+
+class Worker:
+    """
+    claim shards from lease table and run their work units with client
+    lease is extended before every unit, shards of dead workers are claimed again after lease expires,
+    units which are already done are not requested again
+    units with retryable result (rate limit, server or network error) stay pending up to maxAttempts,
+    their shard is released and claimed again after retryDelay seconds, other failed units are marked failed
+    workers should use clients with the same cacheDirPath to share session cookie file of one login
+    """
+
+    def __init__(self, client, leasePath, workerId=None, leaseSeconds=300, handler=None, storeResponses=True, maxAttempts=3, retryDelay=60):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.table = LeaseTable(leasePath)
+        self.workerId = workerId or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leaseSeconds = leaseSeconds
+        self.handler = handler
+        self.storeResponses = storeResponses
+        self.maxAttempts = maxAttempts
+        self.retryDelay = retryDelay
+
+    def claim(self):
+        """
+        claim pending shard or shard with expired lease, returns shard number or None
+        released shards with retryable units are claimed after their retry time (leaseExpires)
+        """
+        now = time.time()
+        with self.table.transaction() as connection:
+            row = connection.execute("""
+                SELECT shard FROM shards
+                WHERE (status='pending' AND (leaseExpires IS NULL OR leaseExpires < ?)) OR (status='running' AND leaseExpires < ?)
+                ORDER BY claims, shard LIMIT 1
+            """, (now, now)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE shards SET status='running', owner=?, leaseExpires=?, claims=claims+1 WHERE shard=?", (self.workerId, now + self.leaseSeconds, row[0]))
+        return row[0]
+
+    def heartbeat(self, shard):
+        """
+        extend lease, returns False if lease was lost
+        """
+        with self.table.transaction() as connection:
+            cursor = connection.execute("UPDATE shards SET leaseExpires=? WHERE shard=? AND owner=? AND status='running'", (time.time() + self.leaseSeconds, shard, self.workerId))
+            return cursor.rowcount == 1
+
+    def runShard(self, shard):
+        defName = inspect.stack()[0][3]
+        units = self.table.connection.execute("SELECT key, settings, attempts FROM units WHERE shard=? AND status='pending'", (shard,)).fetchall()
+        self.logger.info(f"{defName}: worker={self.workerId}, shard={shard}, units={len(units)}")
+        retries = 0
+        for key, settings, attempts in units:
+            if not self.heartbeat(shard):
+                self.logger.warning(f"{defName}: worker={self.workerId}, lost lease of shard={shard}")
+                return False
+            result = self.client.timeSeriesAnalyticsResult(**json.loads(settings))
+            item = self.client.resultItem(result)
+            if self.handler:
+                self.handler(item)
+            with self.table.transaction() as connection:
+                owner = connection.execute("SELECT owner FROM shards WHERE shard=?", (shard,)).fetchone()[0]
+                if owner != self.workerId:
+                    self.logger.warning(f"{defName}: worker={self.workerId}, lost lease of shard={shard}")
+                    return False
+                if result.ok:
+                    status = 'done'
+                elif result.retryable and attempts + 1 < self.maxAttempts:
+                    status = 'pending'
+                    retries += 1
+                else:
+                    status = 'failed'
+                connection.execute(
+                    "UPDATE units SET status=?, resultStatus=?, response=?, worker=?, completed=?, attempts=? WHERE key=?",
+                    (status, result.status, json.dumps(result.response) if self.storeResponses and result.ok else None, self.workerId, None if status == 'pending' else time.time(), attempts + 1, key),
+                )
+        with self.table.transaction() as connection:
+            if retries:
+                # release shard, it is claimed again after retryDelay
+                self.logger.info(f"{defName}: worker={self.workerId}, shard={shard}, retry units={retries} after {self.retryDelay}s")
+                connection.execute("UPDATE shards SET status='pending', owner=NULL, leaseExpires=? WHERE shard=? AND owner=?", (time.time() + self.retryDelay, shard, self.workerId))
+            else:
+                connection.execute("UPDATE shards SET status='done', completed=? WHERE shard=? AND owner=?", (time.time(), shard, self.workerId))
+        return True
+
+    def run(self, waitForOthers=True, pollInterval=5):
+        """
+        run shards until all shards are done
+        waitForOthers - wait for shards leased by other workers, claim them if their leases expire
+        """
+        shards = 0
+        while True:
+            shard = self.claim()
+            if shard is not None:
+                self.runShard(shard)
+                shards += 1
+                continue
+            running = self.table.connection.execute("SELECT COUNT(*) FROM shards WHERE status!='done'").fetchone()[0]
+            if not running or not waitForOthers:
+                return shards
+            time.sleep(pollInterval)
+
+def _workerProcess(leasePath, clientFactory, workerKwargs):
+    worker = Worker(clientFactory(), leasePath, **workerKwargs)
+    worker.run()
+
+def runWorkers(leasePath, clientFactory, processes=4, **workerKwargs):
+    """
+    run local worker processes until all shards are done, returns exit codes of processes
+    clientFactory - picklable function without arguments which returns logged in Client
+    """
+    workers = [ multiprocessing.Process(target=_workerProcess, args=(leasePath, clientFactory, workerKwargs)) for _ in range(processes) ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [ worker.exitcode for worker in workers ]
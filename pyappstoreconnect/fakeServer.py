@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import base64
+import random
+import hashlib
+import datetime
+import threading
+import http.server
+import urllib.parse
+import requests
+
+from .rateLimiter import RateLimiter
+
+# canned settings/all catalog {{
+FAKE_MEASURES = [
+    'impressionsTotal', 'impressionsTotalUnique', 'conversionRate', 'pageViewCount', 'pageViewUnique', 'updates',
+    'units', 'redownloads', 'totalDownloads', 'iap', 'proceeds', 'sales', 'payingUsers',
+    'installs', 'sessions', 'activeDevices', 'rollingActiveDevices', 'crashes', 'uninstalls',
+    'crashRate', 'retentionD1', 'retentionD7', 'retentionD28',
+]
+FAKE_DIMENSIONS = {
+    'source': 6,
+    'platform': 8,
+    'platformVersion': 12,
+    'pageType': 4,
+    'region': 7,
+    'storefront': 175,
+    'appReferrer': 40,
+    'domainReferrer': 60,
+    'campaignId': 30,
+    'peerGroupId': 200,
+}
+FAKE_SETTINGS_ALL = {
+    'measures': [
+        { 'key': measure, 'title': measure, 'dimensions': list(range(len(FAKE_DIMENSIONS))) }
+        for measure in FAKE_MEASURES
+    ],
+    'dimensions': [
+        {
+            'id': dimensionId,
+            'key': key,
+            'title': key,
+            'options': [ { 'id': f"{key}{option}", 'title': f"{key} {option}", 'shortTitle': f"{key[:2]}{option}" } for option in range(options) ],
+        }
+        for dimensionId, (key, options) in enumerate(FAKE_DIMENSIONS.items())
+    ],
+}
+# }}
+
+class FakeServerConfig:
+    """
+    behaviour of FakeServer
+    latency        - mean response time in seconds
+    jitter         - uniform random addition to latency in seconds
+    rateLimit      - requests per second accepted by analytics api, others get 429 (None - no limit)
+    error429Rate   - probability of 429 response
+    error5xxRate   - probability of 500/502/503 response
+    retryAfter     - Retry-After header value in seconds for 429/503 responses (None - no header)
+    sourcesRows    - number of rows in data/sources/list
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, rateLimit=None, error429Rate=0.0, error5xxRate=0.0, retryAfter=1, sourcesRows=120, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rateLimit = rateLimit
+        self.error429Rate = error429Rate
+        self.error5xxRate = error5xxRate
+        self.retryAfter = retryAfter
+        self.sourcesRows = sourcesRows
+        self.seed = seed
+
+def fakeSeries(payload, frequency=None):
+    """
+    time-series response with deterministic values for payload
+    """
+    startDate = datetime.date.fromisoformat(payload['startTime'][:10])
+    endDate = datetime.date.fromisoformat(payload['endTime'][:10])
+    frequency = frequency or payload.get('frequency', 'day')
+    step = { 'day': 1, 'week': 7, 'month': 30 }.get(frequency, 1)
+    group = payload.get('group')
+    if group:
+        dimensionFilters = payload.get('dimensionFilters') or list()
+        if dimensionFilters and dimensionFilters[0]['dimensionKey'] == group['dimension']:
+            keys = list(dimensionFilters[0]['optionKeys'])
+        else:
+            keys = [ f"{group['dimension']}{option}" for option in range(FAKE_DIMENSIONS.get(group['dimension'], 10)) ]
+        keys = keys[:group.get('limit', 10)]
+    else:
+        keys = [None]
+    results = list()
+    for adamId in payload['adamId']:
+        for key in keys:
+            data = list()
+            date = startDate
+            while date <= endDate:
+                point = { 'date': date.strftime("%Y-%m-%dT00:00:00Z") }
+                for measure in payload['measures']:
+                    seed = int(hashlib.md5(f"{adamId}:{measure}:{key}:{date}".encode()).hexdigest()[:6], 16)
+                    if measure.startswith('bench'):
+                        point[measure] = { 'p25': seed % 10 / 10, 'p50': seed % 20 / 10, 'p75': seed % 30 / 10 }
+                    else:
+                        point[measure] = float(seed % 1000)
+                data.append(point)
+                date += datetime.timedelta(days=step)
+            result = {
+                'adamId': str(adamId),
+                'meetsThreshold': True,
+                'data': data,
+                'totals': { 'key': payload['measures'][0], 'value': sum(p[payload['measures'][0]] for p in data if isinstance(p[payload['measures'][0]], float)), 'type': 'COUNT' },
+            }
+            if key is not None:
+                result['group'] = { 'key': key, 'title': key }
+            results.append(result)
+    return { 'size': len(results), 'results': results }
+
+def fakeSourcesList(payload, sourcesRows=120):
+    """
+    data/sources/list response with deterministic rows for payload
+    """
+    offset = payload.get('offset', 0)
+    limit = payload.get('limit', 1)
+    rows = [
+        { 'dimensionKey': payload['dimension'], 'key': f"{payload['dimension']}{row}", 'title': f"{payload['dimension']} {row}", 'data': { measure: float(row) for measure in payload['measures'] } }
+        for row in range(offset, min(offset + limit, sourcesRows))
+    ]
+    return { 'size': len(rows), 'results': rows }
+
+def fakeAnalytics(path, payload, sourcesRows=120):
+    """
+    (http status, data) of analytics api request without error injection
+    """
+    if path.endswith('/settings/all'):
+        return 200, FAKE_SETTINGS_ALL
+    if path.endswith('/data/time-series'):
+        return 200, fakeSeries(payload)
+    if path.endswith('/data/sources/list'):
+        return 200, fakeSourcesList(payload, sourcesRows)
+    return 404, { 'error': 'not found' }
+
+class FakeSession:
+    """
+    in-process stand-in for requests session of client, answers analytics api requests like FakeServer
+    without sockets and records every call: (method, path, request bytes, response bytes)
+    usage:
+```
+client.session = pyappstoreconnect.FakeSession()
+list(client.appAnalytics(appleId))
+print(len(client.session.calls), client.session.bytes())
+```
+    """
+
+    def __init__(self, sourcesRows=120):
+        self.sourcesRows = sourcesRows
+        self.headers = dict()
+        self.cookies = requests.cookies.RequestsCookieJar()
+        self.lock = threading.Lock()
+        self.calls = list()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def request(self, method, url, **kwargs):
+        path = urllib.parse.urlparse(url).path
+        payload = kwargs.get('json')
+        body = json.dumps(payload).encode() if payload is not None else b''
+        if path.startswith('/analytics/api/'):
+            status, data = fakeAnalytics(path, payload or dict(), self.sourcesRows)
+        else:
+            status, data = 404, { 'error': 'not found' }
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(data).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.url = url
+        with self.lock:
+            self.calls.append((method, path, len(body), len(response._content)))
+        return response
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def bytes(self):
+        """
+        (request bytes, response bytes) of all calls
+        """
+        with self.lock:
+            return sum(call[2] for call in self.calls), sum(call[3] for call in self.calls)
+
+    def reset(self):
+        with self.lock:
+            self.calls = list()
+
+class FakeServer:
+    """
+    local stand-in for appstoreconnect.apple.com and idmsa.apple.com shapes:
+        GET  /olympus/v1/app/config
+        GET  /appleauth/auth/signin (hashcash headers)
+        POST /appleauth/auth/signin, /appleauth/auth/signin/init, /appleauth/auth/signin/complete
+        GET  /analytics/api/v1/settings/all
+        POST /analytics/api/{v1,v2}/data/time-series
+        POST /analytics/api/v1/data/sources/list
+    latency, 429/5xx injection, server side rate limit and Retry-After are set by FakeServerConfig
+    usage:
+```
+with pyappstoreconnect.FakeServer(pyappstoreconnect.FakeServerConfig(latency=0.05, error429Rate=0.05)) as server:
+    client = pyappstoreconnect.Client(appStoreConnectUrl=server.url, idmsaUrl=server.url, cacheDirPath='./cache/fake')
+    client.login('user', 'password')
+    print(server.stats)
+```
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or FakeServerConfig()
+        self.random = random.Random(self.config.seed)
+        self.rateLimiter = RateLimiter(self.config.rateLimit) if self.config.rateLimit else None
+        self.lock = threading.Lock()
+        self.stats = { 'requests': 0, 'bytes': 0, 'statuses': dict(), 'paths': dict() }
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self, 'GET')
+
+            def do_POST(self):
+                server.handle(self, 'POST')
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
+
+    def resetStats(self):
+        with self.lock:
+            self.stats = { 'requests': 0, 'bytes': 0, 'statuses': dict(), 'paths': dict() }
+
+    def handle(self, handler, method):
+        parsed = urllib.parse.urlparse(handler.path)
+        path = parsed.path
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        payload = json.loads(body) if body else dict()
+        headers = dict()
+        status, data = 404, { 'error': 'not found' }
+
+        if path == '/olympus/v1/app/config':
+            status, data = 200, { 'authServiceKey': 'fakeWidgetKey' }
+        elif path == '/appleauth/auth/signin' and method == 'GET':
+            status, data = 200, dict()
+            headers = { 'X-Apple-HC-Bits': '1', 'X-Apple-HC-Challenge': 'fakeChallenge' }
+        elif path == '/appleauth/auth/signin/init':
+            status, data = 200, {
+                'iteration': 1000,
+                'salt': base64.b64encode(os.urandom(16)).decode(),
+                'b': base64.b64encode(os.urandom(256)).decode(),
+                'c': 'fakeC',
+                'protocol': 's2k',
+            }
+        elif path in ('/appleauth/auth/signin', '/appleauth/auth/signin/complete'):
+            status, data = 200, dict()
+        elif path.startswith('/analytics/api/'):
+            status, data, headers = self.analytics(path, payload)
+
+        response = json.dumps(data).encode()
+        time.sleep(self.config.latency + self.random.uniform(0, self.config.jitter))
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(response)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(response)
+
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(response)
+            self.stats['statuses'][status] = self.stats['statuses'].get(status, 0) + 1
+            self.stats['paths'][path] = self.stats['paths'].get(path, 0) + 1
+
+    def analytics(self, path, payload):
+        retryHeaders = { 'Retry-After': str(self.config.retryAfter) } if self.config.retryAfter is not None else dict()
+        if path.endswith('/settings/all'):
+            return 200, FAKE_SETTINGS_ALL, dict()
+        # error injection {{
+        if self.rateLimiter and not self.rateLimiter.tryAcquire():
+            return 429, { 'errors': [ { 'code': 'RATE_LIMITED' } ] }, retryHeaders
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.config.error429Rate:
+            return 429, { 'errors': [ { 'code': 'RATE_LIMITED' } ] }, retryHeaders
+        if roll < self.config.error429Rate + self.config.error5xxRate:
+            with self.lock:
+                status = self.random.choice([500, 502, 503])
+            return status, { 'errors': [ { 'code': 'SERVER_ERROR' } ] }, retryHeaders if status == 503 else dict()
+        # }}
+        status, data = fakeAnalytics(path, payload, self.config.sourcesRows)
+        return status, data, dict()
@@ -0,0 +1,174 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .series import iterPoints
+
+class AnalyticsFrame:
+    """
+    dense matrix of time series: values[series, date]
+    labels - list of (adamId, measure, dimension, option, frequency), one per row
+    dates  - sorted list of 'YYYY-MM-DD', one per column
+    missing values are numpy.nan
+    """
+
+    def __init__(self, values, labels, dates):
+        self.values = values
+        self.labels = list(labels)
+        self.dates = list(dates)
+        self.index = { label: row for row,label in enumerate(self.labels) }
+        self.dateIndex = { date: column for column,date in enumerate(self.dates) }
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __repr__(self):
+        return f"AnalyticsFrame(series={len(self.labels)}, dates={len(self.dates)})"
+
+    def rows(self, adamId=None, measure=None, dimension=None, option=None, frequency=None):
+        """
+        row numbers of series matching all not None arguments
+        """
+        match = { 0: adamId, 1: measure, 2: dimension, 3: option, 4: frequency }
+        return [ row for row,label in enumerate(self.labels) if all(value is None or label[position] == value for position,value in match.items()) ]
+
+    def select(self, **kwargs):
+        """
+        sub frame with series matching arguments of rows()
+        """
+        rows = self.rows(**kwargs)
+        return AnalyticsFrame(self.values[rows], [ self.labels[row] for row in rows ], self.dates)
+
+    def series(self, label):
+        return self.values[self.index[tuple(label)]]
+
+    def _derived(self, values, labels):
+        if not labels:
+            return AnalyticsFrame(numpy.empty((0, len(self.dates))), [], self.dates)
+        return AnalyticsFrame(numpy.vstack(values), labels, self.dates)
+
+    def ratio(self, numerator, denominator):
+        """
+        numerator/denominator measures for series with the same adamId, dimension, option and frequency
+        example: frame.ratio('totalDownloads', 'impressionsTotalUnique')
+        """
+        values, labels = list(), list()
+        for row in self.rows(measure=numerator):
+            adamId, _, dimension, option, frequency = self.labels[row]
+            other = self.index.get((adamId, denominator, dimension, option, frequency))
+            if other is None:
+                continue
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                values.append(self.values[row] / self.values[other])
+            labels.append((adamId, f"{numerator}/{denominator}", dimension, option, frequency))
+        return self._derived(values, labels)
+
+    def delta(self, periods=1, relative=False):
+        """
+        change of every series compared to value periods dates before, periods >= 1
+        relative - return (value - previous) / previous
+        """
+        if periods < 1:
+            raise Exception(f"unsupported periods={periods}, must be >= 1")
+        values = numpy.full(self.values.shape, numpy.nan)
+        if periods < len(self.dates):
+            previous = self.values[:, :-periods]
+            values[:, periods:] = self.values[:, periods:] - previous
+            if relative:
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    values[:, periods:] /= previous
+        return AnalyticsFrame(values, self.labels, self.dates)
+
+    def shares(self, measure, dimension):
+        """
+        share of every group option (storefront, source, etc...) in sum of options of dimension in frame by date
+        grouped responses contain only top-N options, so shares are relative to returned options,
+        use frame of client.metricsWithAllGroups() for shares in sum of all options
+        """
+        frame = self.select(measure=measure, dimension=dimension)
+        if not len(frame):
+            return frame
+        totals = {}
+        for row,label in enumerate(frame.labels):
+            totals.setdefault((label[0], label[4]), list()).append(row)
+        values = numpy.full(frame.values.shape, numpy.nan)
+        for rows in totals.values():
+            block = frame.values[rows]
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                values[rows] = block / numpy.nansum(block, axis=0)
+        return AnalyticsFrame(values, [ (adamId, f"{_measure}.share", _dimension, option, frequency) for adamId, _measure, _dimension, option, frequency in frame.labels ], frame.dates)
+
+    def benchmarkGap(self, measure):
+        """
+        difference between app measure and every benchmark percentile of peer group
+        example: frame.benchmarkGap('conversionRate') -> conversionRate - benchConversionRate.p50, etc...
+        positive value means app is above percentile
+        """
+        benchMeasure = 'bench' + measure[0].upper() + measure[1:]
+        values, labels = list(), list()
+        for row,label in enumerate(self.labels):
+            adamId, _measure, dimension, option, frequency = label
+            if not (_measure == benchMeasure or _measure.startswith(benchMeasure+'.')):
+                continue
+            own = self.index.get((adamId, measure, '', '', frequency))
+            if own is None:
+                continue
+            values.append(self.values[own] - self.values[row])
+            percentile = _measure[len(benchMeasure)+1:] or 'value'
+            labels.append((adamId, f"{measure}-{percentile}", dimension, option, frequency))
+        return self._derived(values, labels)
+
+    def topK(self, k, date=None):
+        """
+        labels and values of k biggest series by sum over all dates or by value on date
+        """
+        if date is None:
+            scores = numpy.nansum(self.values, axis=1)
+        else:
+            scores = numpy.nan_to_num(self.values[:, self.dateIndex[date]], nan=-numpy.inf)
+        k = min(k, len(scores))
+        if k <= 0:
+            return list()
+        rows = numpy.argpartition(-scores, k-1)[:k]
+        rows = rows[numpy.argsort(-scores[rows], kind='stable')]
+        return [ (self.labels[row], float(scores[row])) for row in rows ]
+
+def to_frame(items):
+    """
+    build AnalyticsFrame from iterable of { 'settings': ..., 'response': ... } items (appAnalytics, benchmarks, etc...)
+    or { 'settings': ..., 'series': ... } items of metricsWithAllGroups
+    requires numpy
+```
+frame = pyappstoreconnect.to_frame(client.benchmarks(appleId))
+gaps = frame.benchmarkGap('conversionRate')
+```
+    """
+    if numpy is None:
+        raise Exception("numpy is required for to_frame(), install it with 'pip install pyappstoreconnect[frame]'")
+
+    index, dateIndex = dict(), dict()
+    rows, dates, values = list(), list(), list()
+    for item in items:
+        if not item:
+            continue
+        # metricsWithAllGroups yields one series of grouped response per option
+        response = { 'results': [item['series']] } if item.get('series') else item.get('response')
+        if not response:
+            continue
+        for point in iterPoints(item['settings'], response):
+            label = (point.adamId, point.measure, point.dimension, point.option, point.frequency)
+            rows.append(index.setdefault(label, len(index)))
+            dates.append(dateIndex.setdefault(point.date, len(dateIndex)))
+            values.append(point.value)
+
+    # sort dates and remap columns {{
+    sortedDates = sorted(dateIndex)
+    remap = numpy.empty(len(dateIndex), dtype=numpy.intp)
+    for column,date in enumerate(sortedDates):
+        remap[dateIndex[date]] = column
+    # }}
+    matrix = numpy.full((len(index), len(sortedDates)), numpy.nan)
+    if values:
+        matrix[numpy.asarray(rows, dtype=numpy.intp), remap[numpy.asarray(dates, dtype=numpy.intp)]] = numpy.asarray(values, dtype=numpy.float64)
+    return AnalyticsFrame(matrix, list(index), sortedDates)
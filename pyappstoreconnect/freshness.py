@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import inspect
+import datetime
+import threading
+
+from .series import parseDate, formatDate
+
+class FreshnessMixin:
+    """
+    cheap check if Apple published new day of data before full sweep
+    state of every app is kept in cacheDirPath/freshness.json:
+        publishedDate - latest date with data seen by probe
+        publishedSeen - unix time when publishedDate was seen first time
+        syncedDate    - publishedDate of last finished sweep, see markSynced()
+        lags          - last observed publication lags in hours: time from end of day (utc) to first probe which saw it
+    usage:
+```
+for item in client.syncIfFresh(appleId, 'appAnalytics', days=28):
+    store(item)
+print(client.freshness(appleId))
+```
+    """
+
+    freshnessLock = threading.Lock()
+    freshnessMaxLags = 30
+
+    def _freshnessFile(self):
+        return os.path.join(self.cacheDirPath, 'freshness.json')
+
+    def _freshnessState(self):
+        freshnessFile = self._freshnessFile()
+        if os.path.exists(freshnessFile) and os.path.getsize(freshnessFile) > 0:
+            with open(freshnessFile, 'r') as f:
+                return json.load(f)
+        return dict()
+
+    def _saveFreshnessState(self, state):
+        freshnessFile = self._freshnessFile()
+        with open(freshnessFile+'.tmp', 'w') as f:
+            json.dump(state, f, indent=4, sort_keys=True)
+        os.replace(freshnessFile+'.tmp', freshnessFile)
+
+    def freshness(self, appleId):
+        """
+        stored freshness state of app with median publication lag, None if app was not probed
+        """
+        with self.freshnessLock:
+            appState = self._freshnessState().get(str(appleId))
+        if appState is None:
+            return None
+        lags = sorted(appState.get('lags', list()))
+        return dict(appState, lagHours=lags[len(lags)//2] if lags else None)
+
+    def probeFreshness(self, appleId, measure='units', days=7):
+        """
+        one minimal request (single measure, daily, last days) to find latest published date of app, returns dict:
+            publishedDate - latest date with value, None if request failed or there is no data
+            advanced      - publishedDate is newer than syncedDate, full sweep should be started
+            lagDays       - days between today (utc) and publishedDate
+            lagHours      - publication lag observed when publishedDate moved forward, None otherwise
+            result        - Result of probe request
+        request bypasses client.localSources, so answer is never taken from local stores
+        """
+
+        defName = inspect.stack()[0][3]
+        appleId = str(appleId)
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        result = self.timeSeriesAnalyticsResult(appleId, measure, formatDate(today - datetime.timedelta(days=days)), formatDate(today), 'day', localSources=False)
+        publishedDate = None
+        if result.ok:
+            for _result in result.response.get('results') or list():
+                for point in _result.get('data') or list():
+                    if point.get(measure) is None:
+                        continue
+                    date = point['date'][:10]
+                    if publishedDate is None or date > publishedDate:
+                        publishedDate = date
+        else:
+            self.logger.warning(f"{defName}: probe failed, appleId={appleId}, result={result}")
+
+        now = time.time()
+        lagHours = None
+        with self.freshnessLock:
+            state = self._freshnessState()
+            appState = state.setdefault(appleId, { 'publishedDate': None, 'publishedSeen': None, 'syncedDate': None, 'lags': list() })
+            if publishedDate and (appState['publishedDate'] is None or publishedDate > appState['publishedDate']):
+                if appState['publishedDate'] is not None:
+                    # lag is only known when new date was seen by probe, first probe can't tell when date was published
+                    endOfDay = datetime.datetime.combine(parseDate(publishedDate) + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.timezone.utc)
+                    lagHours = round((now - endOfDay.timestamp()) / 3600, 2)
+                    appState['lags'] = (appState['lags'] + [lagHours])[-self.freshnessMaxLags:]
+                appState['publishedDate'] = publishedDate
+                appState['publishedSeen'] = now
+            appState['checked'] = now
+            self._saveFreshnessState(state)
+            appState = dict(appState)
+
+        advanced = bool(appState['publishedDate']) and (appState['syncedDate'] is None or appState['publishedDate'] > appState['syncedDate'])
+        lagDays = (today - parseDate(appState['publishedDate'])).days if appState['publishedDate'] else None
+        self.logger.debug(f"{defName}: appleId={appleId}, publishedDate={appState['publishedDate']}, syncedDate={appState['syncedDate']}, advanced={advanced}, lagDays={lagDays}, lagHours={lagHours}")
+        return {
+            'appleId': appleId,
+            'publishedDate': appState['publishedDate'],
+            'syncedDate': appState['syncedDate'],
+            'advanced': advanced,
+            'lagDays': lagDays,
+            'lagHours': lagHours,
+            'result': result,
+        }
+
+    def markSynced(self, appleId, publishedDate=None):
+        """
+        remember publishedDate (default: latest probed) as synced, next probes are not advanced until newer date is published
+        """
+        appleId = str(appleId)
+        with self.freshnessLock:
+            state = self._freshnessState()
+            appState = state.setdefault(appleId, { 'publishedDate': None, 'publishedSeen': None, 'syncedDate': None, 'lags': list() })
+            appState['syncedDate'] = publishedDate or appState['publishedDate']
+            self._saveFreshnessState(state)
+
+    def syncIfFresh(self, appleId, method='appAnalytics', *args, probeMeasure='units', force=False, **kwargs):
+        """
+        run client generator method (appAnalytics, benchmarks, etc...) only if probe found new published date,
+        app is marked as synced after generator is fully consumed and only if every item has ok result
+        (item['result'].ok), otherwise next call runs method again, returns iterable object with items of method
+        """
+
+        defName = inspect.stack()[0][3]
+        probe = self.probeFreshness(appleId, measure=probeMeasure)
+        if not probe['advanced'] and not force:
+            self.logger.info(f"{defName}: appleId={appleId}, no new data after publishedDate={probe['publishedDate']}, skip {method}")
+            return
+        self.logger.info(f"{defName}: appleId={appleId}, publishedDate={probe['publishedDate']}, syncedDate={probe['syncedDate']}, run {method}")
+        failed = 0
+        for item in getattr(self, method)(appleId, *args, **kwargs):
+            if not isinstance(item, dict) or item.get('result') is None or not item['result'].ok:
+                failed += 1
+            yield item
+        if failed:
+            self.logger.warning(f"{defName}: appleId={appleId}, failed items={failed}, not marked as synced")
+        elif probe['publishedDate']:
+            self.markSynced(appleId, probe['publishedDate'])
@@ -1,18 +1,29 @@
-import inspect
-import json
-
 class MetricsWithFilterMixin:
-    def getMetricsWithFilter(self, appleId, metrics=list(), filters=list(), days=7, startTime=None, endTime=None):
+    def getMetricsWithFilter(self, appleId, metrics=list(), filters=list(), days=7, startTime=None, endTime=None, concurrency=1):
         """
         get metrics by filter
+        concurrency - number of requests sent at once, results are yielded in the same order
         """
 
-        defName = inspect.stack()[0][3]
+        units = self.metricsWithFilterUnits(appleId, metrics=metrics, filters=filters, days=days, startTime=startTime, endTime=endTime)
+        queue = self.newRetryQueue()
+        yield from self.fetchMany(units, concurrency=concurrency, queue=queue)
+
+        # retry deferred units at the end of sweep
+        yield from self.drainRetryQueue(queue)
+        self.endSweep()
+
+    def metricsWithFilterUnits(self, appleId, metrics=list(), filters=list(), days=7, startTime=None, endTime=None):
+        """
+        (settings, extra) of getMetricsWithFilter requests, returns iterable object
+        """
+
+        defName = 'getMetricsWithFilter'
 
         if not isinstance(metrics, list):
             metrics = [metrics]
-        if not isinstance(groups, list):
-            groups = [groups]
+        if not isinstance(filters, list):
+            filters = [filters]
 
         # set default time interval
         if not startTime and not endTime:
@@ -51,10 +62,7 @@ class MetricsWithFilterMixin:
                                 "startTime": startTime,
                                 "endTime": endTime,
                             }
-                            response = self.timeSeriesAnalytics(**args)
-                            yield {
-                                'settings': args,
-                                'response': response,
+                            extra = {
                                 'filters': {
                                     'dimension': {
                                         'id': dimension['id'],
@@ -67,4 +75,4 @@ class MetricsWithFilterMixin:
                                     },
                                 }
                             }
-
+                            yield args, extra
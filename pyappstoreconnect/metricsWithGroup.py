@@ -1,12 +1,26 @@
 import inspect
 
 class MetricsWithGroupMixin:
-    def metricsWithGroups(self, appleId, metrics=list(), groups=list(), days=7, startTime=None, endTime=None, frequency='week'):
+    def metricsWithGroups(self, appleId, metrics=list(), groups=list(), days=7, startTime=None, endTime=None, frequency='week', concurrency=1):
         """
         get metrics with grouping
+        concurrency - number of requests sent at once, results are yielded in the same order
         """
 
-        defName = inspect.stack()[0][3]
+        units = self.metricsWithGroupsUnits(appleId, metrics=metrics, groups=groups, days=days, startTime=startTime, endTime=endTime, frequency=frequency)
+        queue = self.newRetryQueue()
+        yield from self.fetchMany(units, concurrency=concurrency, queue=queue)
+
+        # retry deferred units at the end of sweep
+        yield from self.drainRetryQueue(queue)
+        self.endSweep()
+
+    def metricsWithGroupsUnits(self, appleId, metrics=list(), groups=list(), days=7, startTime=None, endTime=None, frequency='week'):
+        """
+        timeSeriesAnalytics settings of metricsWithGroups requests, returns iterable object
+        """
+
+        defName = 'metricsWithGroups'
 
         if not isinstance(metrics, list):
             metrics = [metrics]
@@ -49,9 +63,114 @@ class MetricsWithGroupMixin:
                                 'limit': 10,
                             }
                         }
-                        response = self.timeSeriesAnalytics(**args)
-                        yield {
-                            'settings': args,
-                            'response': response,
+                        yield args
+
+    def metricsWithAllGroups(self, appleId, metrics=list(), groups=list(), days=7, startTime=None, endTime=None, frequency='week', limit=10, batchSize=10, concurrency=1):
+        """
+        get metrics with all group values, not only top 10
+        first request gets top groups by rank, other options of dimension from settings/all are requested in
+        batches of batchSize options with dimensionFilters, so one dimension costs 1 + ceil(options / batchSize) requests
+        returns iterable object with one item per group value:
+            { 'metric': ..., 'dimension': ..., 'option': { 'id': ..., 'title': ... }, 'series': ..., 'complete': ..., 'settings': ..., 'result': ... }
+        failed requests are yielded with option None and series None
+        complete is False when settings/all has no options of dimension (referrers, etc...), only top limit values are returned
+        remaining options are requested even if top groups request failed or was deferred (deferRetries)
+        """
+
+        defName = inspect.stack()[0][3]
+
+        if not isinstance(metrics, list):
+            metrics = [metrics]
+        if not isinstance(groups, list):
+            groups = [groups]
+
+        # set default time interval
+        if not startTime and not endTime:
+            timeInterval = self.timeInterval(days)
+            startTime = timeInterval['startTime']
+            endTime = timeInterval['endTime']
+
+        states = dict() # { (metric, group): (seen option ids, option titles, complete) }
+        queue = self.newRetryQueue()
+        for metric in metrics:
+            # get available dimensions id for metrics {{
+            availableDimensionsIds = list()
+            for measure in self.apiSettingsAll['measures']:
+                if measure['key'] == metric or measure['title'] == metric:
+                    availableDimensionsIds = measure['dimensions']
+            # }}
+            for group in groups:
+                for dimension in self.apiSettingsAll['dimensions']:
+                    if dimension['key'] != group:
+                        continue
+                    if dimension['id'] not in availableDimensionsIds:
+                        self.logger.debug(f"{defName}: group={group}, dimension['id']={dimension['id']} not in availableDimensionsIds={availableDimensionsIds}")
+                        continue
+                    titles = { str(option['id']): option['title'] for option in dimension.get('options') or list() }
+                    complete = bool(titles)
+                    if not complete:
+                        self.logger.warning(f"{defName}: metric={metric}, group={group}, settings/all has no options of dimension, only top {limit} values are returned")
+                    args = {
+                        'adamId': appleId,
+                        'measures': metric,
+                        'frequency': frequency,
+                        'startTime': startTime,
+                        'endTime': endTime,
+                        'group': {
+                            'metric': metric,
+                            'dimension': group,
+                            'rank': 'DESCENDING',
+                            'limit': limit,
                         }
+                    }
+                    seen = states.setdefault((metric, group), (set(), titles, complete))[0]
+
+                    # ranked top groups {{
+                    item = self.fetchUnit(args, queue=queue)
+                    if item:
+                        yield from self._groupItems(item, states)
+                    # }}
 
+                    # remaining options in batches, all options if top groups request failed {{
+                    remainder = [ key for key in titles if key not in seen ]
+                    if not remainder:
+                        continue
+                    batches = list()
+                    for i in range(0, len(remainder), batchSize):
+                        batch = remainder[i:i+batchSize]
+                        batchArgs = dict(args, group=dict(args['group'], limit=len(batch)), dimensionFilters=[
+                            {
+                                'dimensionKey': group,
+                                'optionKeys': batch,
+                            },
+                        ])
+                        batches.append(batchArgs)
+                    self.logger.debug(f"{defName}: metric={metric}, group={group}, top groups={len(seen)}, remaining options={len(remainder)}, batches={len(batches)}")
+                    for item in self.fetchMany(batches, concurrency=concurrency, queue=queue):
+                        yield from self._groupItems(item, states)
+                    # }}
+
+        # retry deferred units at the end of sweep
+        for item in self.drainRetryQueue(queue):
+            yield from self._groupItems(item, states)
+        self.endSweep()
+
+    def _groupItems(self, item, states):
+        """
+        split grouped response into items per group value, skip already yielded values
+        """
+        metric = item['settings']['measures']
+        group = item['settings']['group']['dimension']
+        seen, titles, complete = states[(metric, group)]
+        result = item['result']
+        if not result.ok:
+            self.logger.error(f"metricsWithAllGroups: metric={metric}, group={group}, failed request, result={result}")
+            yield { 'metric': metric, 'dimension': group, 'option': None, 'series': None, 'complete': complete, 'settings': item['settings'], 'result': result }
+            return
+        for series in result.response['results']:
+            key = str((series.get('group') or dict()).get('key'))
+            if key in seen:
+                continue
+            seen.add(key)
+            option = { 'id': key, 'title': (series.get('group') or dict()).get('title') or titles.get(key) }
+            yield { 'metric': metric, 'dimension': group, 'option': option, 'series': series, 'complete': complete, 'settings': item['settings'], 'result': result }
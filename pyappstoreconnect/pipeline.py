@@ -0,0 +1,117 @@
+import json
+import inspect
+import logging
+import concurrent.futures
+
+from .series import iterPoints
+
+def flattenResponse(settings, body, batchSize=1000, normalize=None):
+    """
+    decode raw time-series response and flatten it into batches of rows, runs in worker process
+    rows are Point tuples or results of normalize(point), rows for which normalize returns None are skipped
+    """
+    response = json.loads(body)
+    if 'results' not in response:
+        raise Exception(f"'results' not found in response, settings={settings}")
+    batches = list()
+    batch = list()
+    for point in iterPoints(settings, response):
+        row = normalize(point) if normalize else point
+        if row is None:
+            continue
+        batch.append(row)
+        if len(batch) >= batchSize:
+            batches.append(batch)
+            batch = list()
+    if batch:
+        batches.append(batch)
+    return batches
+
+class FlattenPipeline:
+    """
+    fetch time-series responses in threads and decode/flatten them in process pool,
+    network I/O and transformation overlap, rows are yielded in batches in order of completion
+    at most maxPending units are fetched or transformed at once, so slow consumer holds fetching back
+    usage:
+```
+pipeline = pyappstoreconnect.FlattenPipeline(client, processes=4, fetchConcurrency=8)
+units = client.metricsWithGroupsUnits(appleId, metrics=['units', 'proceeds'], groups=['storefront', 'source'])
+for batch in pipeline.run(units):
+    store(batch)
+print(pipeline.failed)
+```
+    normalize - picklable function (module level) applied to every Point in worker process
+    responses are not decoded in main process, so fetch() goes straight to postResult() (client.rateLimiter and
+    requestsRetry still apply) and bypasses timeSeriesAnalyticsResult() extension points:
+        client.localSources - are not asked, every unit is requested upstream
+        client.sinks        - are not fed, store rows of batches instead
+        client.retryQueue   - failed units are not deferred, their Result is appended to self.failed
+                              (exceptions of failed transformations too), run them again with new pipeline.run()
+    """
+
+    def __init__(self, client, processes=None, fetchConcurrency=4, maxPending=None, batchSize=1000, normalize=None):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.processes = processes
+        self.fetchConcurrency = fetchConcurrency
+        self.maxPending = maxPending or fetchConcurrency * 2
+        self.batchSize = batchSize
+        self.normalize = normalize
+        self.failed = list()
+        self.stats = { 'units': 0, 'batches': 0, 'rows': 0, 'bytes': 0 }
+
+    def fetch(self, settings):
+        """
+        raw response of unit, runs in thread
+        """
+        url, payload = self.client.timeSeriesAnalyticsRequest(settings)
+        return self.client.postResult('timeSeriesAnalytics', url, payload, settings, decode=False)
+
+    def run(self, units):
+        """
+        returns iterable object with batches (lists) of rows
+        units - iterable of timeSeriesAnalytics settings or (settings, extra) tuples
+        """
+
+        defName = inspect.stack()[0][3]
+        units = iter(units)
+        exhausted = False
+        fetches = set()
+        transforms = dict() # { future: settings }
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.fetchConcurrency) as threads, concurrent.futures.ProcessPoolExecutor(max_workers=self.processes) as processes:
+            while True:
+                # keep maxPending units in flight {{
+                while not exhausted and len(fetches) + len(transforms) < self.maxPending:
+                    unit = next(units, None)
+                    if unit is None:
+                        exhausted = True
+                        break
+                    settings = unit[0] if isinstance(unit, tuple) else unit
+                    fetches.add(threads.submit(self.fetch, dict(settings)))
+                # }}
+                if not fetches and not transforms:
+                    return
+                done, _ = concurrent.futures.wait(fetches | set(transforms), return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    if future in fetches:
+                        fetches.remove(future)
+                        result = future.result()
+                        if not result.ok:
+                            self.logger.error(f"{defName}: failed fetch, result={result}")
+                            self.failed.append(result)
+                            continue
+                        self.stats['bytes'] += len(result.response)
+                        transforms[processes.submit(flattenResponse, result.settings, result.response, self.batchSize, self.normalize)] = result.settings
+                        continue
+                    settings = transforms.pop(future)
+                    try:
+                        batches = future.result()
+                    except Exception as e:
+                        self.logger.error(f"{defName}: failed flatten, settings={settings}, error={str(e)}")
+                        self.failed.append(e)
+                        continue
+                    self.stats['units'] += 1
+                    for batch in batches:
+                        self.stats['batches'] += 1
+                        self.stats['rows'] += len(batch)
+                        yield batch
@@ -0,0 +1,254 @@
+import io
+import sys
+import time
+import pstats
+import cProfile
+import inspect
+import logging
+import threading
+import functools
+import tracemalloc
+
+class PhaseTimer:
+    """
+    thread safe exclusive timings of nested phases: time of nested phase is not counted in parent phase
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.totals = dict() # { (method, phase): [seconds, count] }
+        self.method = None
+
+    def _stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = list()
+        return self.local.stack
+
+    def _add(self, phase, seconds, count):
+        with self.lock:
+            total = self.totals.setdefault((self.method, phase), [0.0, 0])
+            total[0] += seconds
+            total[1] += count
+
+    def enter(self, phase):
+        now = time.perf_counter()
+        stack = self._stack()
+        if stack:
+            parent = stack[-1]
+            self._add(parent[0], now - parent[1], 0)
+        stack.append([phase, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        stack = self._stack()
+        phase, startTime = stack.pop()
+        self._add(phase, now - startTime, 1)
+        if stack:
+            stack[-1][1] = now
+
+    def wrap(self, phase, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+class Profiler:
+    """
+    profiling mode for client sweeps: cProfile (all threads), tracemalloc and per-phase timings
+    phases: hashcash, auth, settings, request, decode, consumer (time spent in consumer of yielded items)
+    hashcash is made by Client() before profiler is attached, run('login', ...) makes new hashcash under profiler
+    usage:
+```
+profiler = pyappstoreconnect.Profiler(client)
+profiler.run('login', username, password)
+profiler.run('appAnalytics', appleId, consumer=store)
+profiler.run('appAnalytics', appleId, concurrency=8, consumer=store)
+profiler.writeReport('./cache/profile.txt')
+```
+    """
+
+    def __init__(self, client, topN=25, traceFrames=1):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.topN = topN
+        self.traceFrames = traceFrames
+        self.timer = PhaseTimer()
+        self.profiles = dict() # { label: [cProfile.Profile of every thread] }
+        self.profilesLock = threading.Lock()
+        self.runs = list()
+        self.attach()
+
+    def attach(self):
+        """
+        wrap client and session methods with phase timers, wrappers are instance attributes and
+        are removed by detach()
+        """
+        client = self.client
+        timer = self.timer
+        client.login = timer.wrap('auth', type(client).login.__get__(client))
+        client.getSettingsAll = timer.wrap('settings', type(client).getSettingsAll.__get__(client))
+        client.getHashcash = timer.wrap('hashcash', type(client).getHashcash.__get__(client))
+
+        def request(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                response = timer.wrap('request', function)(*args, **kwargs)
+                response.json = timer.wrap('decode', response.json)
+                return response
+            return wrapper
+        session = client.session
+        session.post = request(type(session).post.__get__(session))
+        session.get = request(type(session).get.__get__(session))
+
+    def detach(self):
+        for name in ('login', 'getSettingsAll', 'getHashcash'):
+            self.client.__dict__.pop(name, None)
+        for name in ('post', 'get'):
+            self.client.session.__dict__.pop(name, None)
+
+    def _threadProfile(self, frame, event, arg):
+        # started in every new thread by threading.setprofile(), replaces itself with cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self.profilesLock:
+            self.profiles.setdefault(self.timer.method, list()).append(profile)
+        profile.enable()
+
+    def run(self, method, *args, consumer=None, **kwargs):
+        """
+        run client method under profiler, generators are consumed item by item with consumer(item),
+        returns result of method (list of items for generators)
+        """
+
+        defName = inspect.stack()[0][3]
+        concurrency = kwargs.get('concurrency', 1)
+        label = method if concurrency == 1 else f"{method}[concurrency={concurrency}]"
+        self.timer.method = label
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(self.traceFrames)
+        tracemalloc.reset_peak()
+        startMemory = tracemalloc.get_traced_memory()[0]
+        profile = cProfile.Profile()
+        with self.profilesLock:
+            self.profiles.setdefault(label, list()).append(profile)
+        threading.setprofile(self._threadProfile)
+        startTime = time.perf_counter()
+        items = 0
+        profile.enable()
+        try:
+            if method == 'login':
+                # login sends hashcash made by Client(), make it again to see hashcash phase
+                self.client.hashcash = self.client.getHashcash()
+                self.client.headers['X-Apple-HC'] = self.client.hashcash
+            result = getattr(self.client, method)(*args, **kwargs)
+            if inspect.isgenerator(result):
+                collected = list()
+                for item in result:
+                    items += 1
+                    self.timer.enter('consumer')
+                    try:
+                        if consumer:
+                            consumer(item)
+                        else:
+                            collected.append(item)
+                    finally:
+                        self.timer.exit()
+                result = collected
+        finally:
+            profile.disable()
+            threading.setprofile(None)
+            wallTime = time.perf_counter() - startTime
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if not tracing:
+                tracemalloc.stop()
+            self.runs.append({
+                'method': method,
+                'label': label,
+                'concurrency': concurrency,
+                'wallTime': wallTime,
+                'items': items,
+                'peakMemory': peak - startMemory,
+                'retainedMemory': current - startMemory,
+                'allocations': [ (str(stat.traceback), stat.size, stat.count) for stat in snapshot.statistics('lineno')[:self.topN] ],
+            })
+            self.logger.debug(f"{defName}: method={method}, wallTime={wallTime:.3f}, items={items}, peakMemory={peak - startMemory}")
+        return result
+
+    def phases(self, label=None):
+        """
+        { phase: { 'seconds': ..., 'count': ... } } summed over threads
+        label - method name or 'method[concurrency=N]' for concurrent runs
+        """
+        result = dict()
+        with self.timer.lock:
+            for (_method, phase), (seconds, count) in self.timer.totals.items():
+                if label is not None and _method != label:
+                    continue
+                total = result.setdefault(phase, { 'seconds': 0.0, 'count': 0 })
+                total['seconds'] += seconds
+                total['count'] += count
+        return result
+
+    def stats(self, label=None):
+        """
+        pstats.Stats of all threads, None if there are no calls
+        label - method name or 'method[concurrency=N]' for concurrent runs, None for all runs
+        """
+        with self.profilesLock:
+            profiles = [ profile for _label,_profiles in self.profiles.items() if label is None or _label == label for profile in _profiles ]
+        stats = None
+        for profile in profiles:
+            try:
+                profileStats = pstats.Stats(profile)
+            except TypeError:
+                # profile of thread without calls
+                continue
+            if stats is None:
+                stats = profileStats
+            else:
+                stats.add(profileStats)
+        return stats
+
+    def report(self, sortBy='tottime'):
+        """
+        text report: runs with wall time and peak memory, phase timings, top hot spots and allocations
+        """
+        lines = list()
+        lines.append("## runs")
+        for run in self.runs:
+            lines.append(f"method={run['method']} concurrency={run['concurrency']} wallTime={run['wallTime']:.3f}s items={run['items']} peakMemory={run['peakMemory']/1024:.1f}KiB retainedMemory={run['retainedMemory']/1024:.1f}KiB")
+        lines.append("")
+        lines.append("## phases (exclusive time, summed over threads)")
+        for label in sorted({ run['label'] for run in self.runs }):
+            lines.append(f"method={label}")
+            for phase, total in sorted(self.phases(label).items(), key=lambda item: -item[1]['seconds']):
+                lines.append(f"    {phase:10} {total['seconds']:10.3f}s count={total['count']}")
+        lines.append("")
+        lines.append(f"## top allocations")
+        for run in self.runs:
+            lines.append(f"method={run['method']} concurrency={run['concurrency']}")
+            for traceback, size, count in run['allocations'][:10]:
+                lines.append(f"    {size/1024:10.1f}KiB count={count} {traceback}")
+        lines.append("")
+        lines.append(f"## hot spots (sort by {sortBy})")
+        for label in sorted({ run['label'] for run in self.runs }):
+            stats = self.stats(label)
+            if stats is None:
+                continue
+            lines.append(f"method={label}")
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats(sortBy).print_stats(self.topN)
+            lines.append(stream.getvalue())
+        return "\n".join(lines)
+
+    def writeReport(self, path, sortBy='tottime'):
+        with open(path, 'w') as f:
+            f.write(self.report(sortBy=sortBy))
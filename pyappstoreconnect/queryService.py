@@ -0,0 +1,258 @@
+import json
+import time
+import inspect
+import logging
+import datetime
+import threading
+import collections
+import http.server
+import urllib.parse
+
+from .series import parseDate
+from .results import Result
+
+class ResponseCache:
+    """
+    thread safe LRU of responses bounded by total size, entries expire after ttl seconds
+    responses are kept json encoded, so hits are served without encoding and size is exact
+    """
+
+    def __init__(self, maxBytes=256*1024*1024):
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict() # { key: (body, expires) }
+        self.bytes = 0
+        self.stats = { 'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0 }
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[1] < time.time():
+                self._remove(key)
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def put(self, key, body, ttl):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if len(body) > self.maxBytes:
+                return
+            self.entries[key] = (body, time.time() + ttl)
+            self.bytes += len(body)
+            while self.bytes > self.maxBytes:
+                self._remove(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= len(entry[0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+class QueryService:
+    """
+    local read-through http service on top of one authenticated client, answers api shaped requests:
+        GET  /analytics/api/v1/settings/all
+        POST /analytics/api/{v1,v2}/data/time-series
+        POST /analytics/api/{v1,v2}/data/sources/list
+        GET  /stats
+    responses are kept in memory bounded LRU, concurrent identical requests are coalesced
+    into one upstream request, failed upstream responses are returned with their http status and not cached
+    usage:
+```
+client = pyappstoreconnect.Client()
+client.login(username, password)
+with pyappstoreconnect.QueryService(client, port=8080, maxBytes=512*1024*1024) as service:
+    service.serveForever()
+```
+    consumers send the same payloads as to appstoreconnect.apple.com without login:
+```
+requests.post('http://127.0.0.1:8080/analytics/api/v1/data/time-series', json=payload).json()
+```
+    ttl     - seconds to keep responses of closed intervals
+    openTtl - seconds to keep responses which end in last openDays days, Apple still updates them
+    """
+
+    def __init__(self, client, host='127.0.0.1', port=0, maxBytes=256*1024*1024, ttl=6*3600, openTtl=300, openDays=3):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.ttl = ttl
+        self.openTtl = openTtl
+        self.openDays = openDays
+        self.cache = ResponseCache(maxBytes)
+        self.lock = threading.Lock()
+        self.inflight = dict() # { key: [threading.Event, (status, body)] }
+        self.stats = { 'requests': 0, 'upstream': 0, 'coalesced': 0, 'errors': 0 }
+        service = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                service.logger.debug(f"{self.address_string()} {format % args}")
+
+            def do_GET(self):
+                service.handle(self, 'GET')
+
+            def do_POST(self):
+                service.handle(self, 'POST')
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = None
+
+    # server {{
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serveForever(self):
+        """
+        serve in current thread until stop() or KeyboardInterrupt
+        """
+        try:
+            if self.thread:
+                self.thread.join()
+            else:
+                self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
+    # }}
+
+    def allStats(self):
+        with self.lock:
+            stats = dict(self.stats, inflight=len(self.inflight))
+        with self.cache.lock:
+            stats.update(self.cache.stats)
+            stats.update({ 'entries': len(self.cache.entries), 'bytes': self.cache.bytes, 'maxBytes': self.cache.maxBytes })
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def handle(self, handler, method):
+        defName = inspect.stack()[0][3]
+        path = urllib.parse.urlparse(handler.path).path
+        with self.lock:
+            self.stats['requests'] += 1
+        try:
+            length = int(handler.headers.get('Content-Length') or 0)
+            payload = json.loads(handler.rfile.read(length)) if length else dict()
+            if path == '/stats':
+                status, body = 200, json.dumps(self.allStats()).encode()
+            else:
+                status, body = self.query(method, path, payload)
+        except Exception as e:
+            self.logger.error(f"{defName}: path={path}, error={str(e)}")
+            status, body = 400, json.dumps({ 'errors': [ { 'code': 'BAD_REQUEST', 'title': str(e) } ] }).encode()
+        if status != 200:
+            with self.lock:
+                self.stats['errors'] += 1
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def upstream(self, method, path, payload):
+        """
+        Result of client request for api path and payload
+        """
+        parts = path.strip('/').split('/')
+        if method == 'GET' and path == '/analytics/api/v1/settings/all':
+            # loaded by client.login()
+            data = self.client.apiSettingsAll or self.client.getSettingsAll()
+            if not data:
+                return Result('getSettingsAll', dict(), 'httpError', error='failed get settings')
+            return Result('getSettingsAll', dict(), 'ok', response=data)
+        if method == 'POST' and len(parts) >= 5 and parts[:2] == ['analytics', 'api'] and parts[3] == 'data':
+            apiVersion = parts[2]
+            endpoint = '/'.join(parts[4:])
+            if endpoint == 'time-series':
+                return self.client.timeSeriesAnalyticsResult(
+                    payload['adamId'], payload['measures'], payload['startTime'], payload['endTime'], payload['frequency'],
+                    group=payload.get('group'), dimensionFilters=payload.get('dimensionFilters') or list(), apiVersion=apiVersion,
+                )
+            if endpoint == 'sources/list':
+                return self.client.sourcesListResult(
+                    payload['adamId'], payload['measures'], payload['startTime'], payload['endTime'], payload['frequency'], payload['dimension'],
+                    apiVersion=apiVersion, limit=payload.get('limit', 1), offset=payload.get('offset'),
+                )
+        return None
+
+    def ttlOf(self, payload):
+        endTime = payload.get('endTime')
+        if endTime and parseDate(endTime) > datetime.date.today() - datetime.timedelta(days=self.openDays):
+            return self.openTtl
+        return self.ttl
+
+    def query(self, method, path, payload):
+        """
+        (http status, body) of api request, answered from cache, by running identical request or upstream
+        """
+
+        defName = inspect.stack()[0][3]
+        key = f"{method} {path} {json.dumps(payload, sort_keys=True)}"
+        entry = self.cache.get(key)
+        if entry is not None:
+            return 200, entry[0]
+
+        # coalesce identical requests {{
+        with self.lock:
+            slot = self.inflight.get(key)
+            leader = slot is None
+            if leader:
+                slot = self.inflight[key] = [threading.Event(), None]
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            slot[0].wait()
+            return slot[1]
+        # }}
+
+        try:
+            with self.lock:
+                self.stats['upstream'] += 1
+            result = self.upstream(method, path, payload)
+            if result is None:
+                answer = 404, json.dumps({ 'errors': [ { 'code': 'NOT_FOUND', 'title': f"unsupported {method} {path}" } ] }).encode()
+            elif result.ok:
+                body = json.dumps(result.response).encode()
+                self.cache.put(key, body, self.ttlOf(payload))
+                answer = 200, body
+            else:
+                self.logger.warning(f"{defName}: upstream failed, path={path}, result={result}")
+                answer = result.statusCode if result.statusCode and result.statusCode != 200 else 502, json.dumps({ 'errors': [ dict(result.asDict(), code=result.status) ] }).encode()
+        except Exception as e:
+            self.logger.error(f"{defName}: upstream failed, path={path}, error={str(e)}")
+            answer = 502, json.dumps({ 'errors': [ { 'code': 'UPSTREAM_ERROR', 'title': str(e) } ] }).encode()
+        finally:
+            slot[1] = answer
+            with self.lock:
+                self.inflight.pop(key, None)
+            slot[0].set()
+        return answer
@@ -0,0 +1,95 @@
+import time
+import collections
+import threading
+
+class RateLimiter:
+    """
+    thread safe token bucket rate limiter
+    rate  - tokens (requests) added per second
+    burst - bucket size, maximum number of requests sent without waiting
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0 # total time spent in acquire()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def tryAcquire(self, tokens=1):
+        """
+        take tokens without waiting, returns False if bucket has not enough tokens
+        """
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        take tokens, wait until bucket has enough tokens
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.waited += wait
+            time.sleep(wait)
+
+class RequestBudget:
+    """
+    thread safe sliding window budget: at most limit requests per window seconds (default one hour)
+    has the same acquire()/tryAcquire() interface as RateLimiter
+    """
+
+    def __init__(self, limit, window=3600):
+        self.limit = limit
+        self.window = window
+        self.requests = collections.deque()
+        self.lock = threading.Lock()
+
+    def _expire(self, now):
+        while self.requests and self.requests[0] <= now - self.window:
+            self.requests.popleft()
+
+    def used(self):
+        with self.lock:
+            self._expire(time.time())
+            return len(self.requests)
+
+    def remaining(self):
+        return max(self.limit - self.used(), 0)
+
+    def tryAcquire(self, tokens=1, limit=None):
+        """
+        take tokens without waiting, returns False if more than limit (default: whole budget) would be used
+        """
+        with self.lock:
+            now = time.time()
+            self._expire(now)
+            if len(self.requests) + tokens > (self.limit if limit is None else limit):
+                return False
+            self.requests.extend([now] * tokens)
+            return True
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.time()
+                self._expire(now)
+                if len(self.requests) + tokens <= self.limit:
+                    self.requests.extend([now] * tokens)
+                    return
+                wait = self.requests[0] + self.window - now
+            time.sleep(max(wait, 0.01))
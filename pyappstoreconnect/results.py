@@ -0,0 +1,317 @@
+import re
+import inspect
+import time
+import copy
+import json
+import heapq
+import itertools
+import email.utils
+import contextvars
+import collections
+import concurrent.futures
+import requests
+
+class Result(dict):
+    """
+    typed result of one api request (work unit)
+    result is also dict of asDict() fields, so items with result stay json serializable
+    status:
+        ok           - success, response contains decoded json
+        rateLimited  - http 429
+        serverError  - http 5xx
+        httpError    - other non 200 http status
+        networkError - connection error, timeout or exhausted requests retries
+        decodeError  - response body is not json
+        badPayload   - json without 'results'
+    source:
+        network      - response received from api
+        local        - response answered by one of client.localSources (rollups, etc...)
+    """
+
+    RETRYABLE = ('rateLimited', 'serverError', 'networkError')
+    FIELDS = ('method', 'status', 'statusCode', 'errorClass', 'error', 'latency', 'attempts', 'retryAfter', 'source')
+
+    def __init__(self, method, settings, status, response=None, statusCode=None, errorClass=None, error=None, latency=0.0, attempts=1, retryAfter=None, exception=None, source='network'):
+        self.method = method
+        self.settings = settings
+        self.status = status
+        self.response = response
+        self.statusCode = statusCode
+        self.errorClass = errorClass
+        self.error = error
+        self.latency = latency
+        self.attempts = attempts
+        self.retryAfter = retryAfter
+        self.exception = exception
+        self.source = source
+
+    def __setattr__(self, name, value):
+        # keep dict fields in sync with attributes
+        super().__setattr__(name, value)
+        if name in self.FIELDS:
+            self[name] = value
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+    @property
+    def retryable(self):
+        return self.status in self.RETRYABLE
+
+    def legacyResponse(self):
+        """
+        value returned by timeSeriesAnalytics/sourcesList before result objects:
+        data on success, None if response is not json, False otherwise
+        """
+        if self.ok:
+            return self.response
+        if self.status == 'decodeError':
+            return None
+        return False
+
+    def asDict(self):
+        return { name: self[name] for name in self.FIELDS }
+
+    def __repr__(self):
+        return f"Result(method={self.method}, status={self.status}, statusCode={self.statusCode}, latency={self.latency:.3f}, attempts={self.attempts}, source={self.source})"
+
+class RetryQueue:
+    """
+    deferred retry queue for failed work units
+    units are ordered by time when they may be retried (Retry-After or exponential backoff),
+    queue can be saved to file and drained later or by another worker:
+```
+queue = client.newRetryQueue()
+items = list(client.fetchMany(units, queue=queue))
+queue.dump('./cache/retryQueue.json')
+...
+queue = pyappstoreconnect.RetryQueue.load('./cache/retryQueue.json')
+for item in otherClient.drainRetryQueue(queue):
+    print(item)
+```
+    """
+
+    def __init__(self, maxAttempts=4, backoffFactor=30, maxBackoff=600):
+        self.maxAttempts = maxAttempts
+        self.backoffFactor = backoffFactor
+        self.maxBackoff = maxBackoff
+        self._heap = list()
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def delay(self, result):
+        if result.retryAfter is not None:
+            return min(result.retryAfter, self.maxBackoff)
+        return min(self.backoffFactor * (2 ** max(result.attempts-1, 0)), self.maxBackoff)
+
+    def push(self, result, extra=None, notBefore=None):
+        if notBefore is None:
+            notBefore = time.time() + self.delay(result)
+        entry = {
+            'method': result.method,
+            'settings': result.settings,
+            'attempts': result.attempts,
+            'status': result.status,
+            'extra': extra or dict(),
+            'notBefore': notBefore,
+        }
+        heapq.heappush(self._heap, (notBefore, next(self._counter), entry))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def dump(self, path):
+        entries = [ entry for _,_,entry in sorted(self._heap) ]
+        with open(path, 'w') as f:
+            json.dump({ 'maxAttempts': self.maxAttempts, 'backoffFactor': self.backoffFactor, 'maxBackoff': self.maxBackoff, 'entries': entries }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        queue = cls(maxAttempts=data['maxAttempts'], backoffFactor=data['backoffFactor'], maxBackoff=data['maxBackoff'])
+        for entry in data['entries']:
+            heapq.heappush(queue._heap, (entry['notBefore'], next(queue._counter), entry))
+        return queue
+
+class ResultsMixin:
+    def postResult(self, method, url, payload, settings, decode=True):
+        """
+        post payload to analytics api and classify response into Result
+        decode - if False, response body is not decoded and Result.response contains raw bytes
+        """
+
+        headers = {
+            "X-Requested-By": "appstoreconnect.apple.com",
+        }
+        self.logger.debug(f"{method}: payload={json.dumps(payload)}")
+        if self.rateLimiter:
+            self.rateLimiter.acquire()
+        startTime = time.monotonic()
+        try:
+            response = self.session.post(url, json=payload, headers=headers)
+        except requests.exceptions.RetryError as e:
+            # inline retries of status_forcelist are exhausted, reason is ResponseError('too many 429 error responses')
+            latency = time.monotonic() - startTime
+            reason = str(getattr(e.args[0], 'reason', None) if e.args else e)
+            statusCode = re.search(r"too many (\d{3}) error responses", reason)
+            statusCode = int(statusCode.group(1)) if statusCode else None
+            if statusCode == 429:
+                status = 'rateLimited'
+            elif statusCode and statusCode >= 500:
+                status = 'serverError'
+            else:
+                status = 'networkError'
+            attempts = (self.requestsRetrySettings.get('total') or 0) + 1 if self.requestsRetry else 1
+            self.logger.error(f"{method}: retries exhausted, status_code={statusCode}, attempts={attempts}, payload={payload}")
+            return Result(method, settings, status, statusCode=statusCode, errorClass=type(e).__name__, error=reason, latency=latency, attempts=attempts, exception=e)
+        except requests.exceptions.RequestException as e:
+            latency = time.monotonic() - startTime
+            self.logger.error(f"{method}: request failed, error={str(e)}, payload={payload}")
+            return Result(method, settings, 'networkError', errorClass=type(e).__name__, error=str(e), latency=latency, exception=e)
+        latency = time.monotonic() - startTime
+
+        # requests retries made by urllib3 inside session adapter
+        attempts = 1
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and getattr(retries, 'history', None):
+            attempts += len(retries.history)
+
+        # check status_code
+        if response.status_code != 200:
+            self.logger.error(f"{method}: status_code={response.status_code}, payload={payload}, response.text={response.text}")
+            if response.status_code == 429:
+                status = 'rateLimited'
+            elif response.status_code >= 500:
+                status = 'serverError'
+            else:
+                status = 'httpError'
+            return Result(method, settings, status, statusCode=response.status_code, errorClass='HTTPError', error=response.text, latency=latency, attempts=attempts, retryAfter=self.parseRetryAfter(response.headers.get('Retry-After')))
+
+        if not decode:
+            return Result(method, settings, 'ok', response=response.content, statusCode=response.status_code, latency=latency, attempts=attempts)
+
+        # check json data
+        try:
+            data = response.json()
+        except Exception as e:
+            self.logger.error(f"{method}: failed get response.json(), error={str(e)}")
+            return Result(method, settings, 'decodeError', statusCode=response.status_code, errorClass=type(e).__name__, error=str(e), latency=latency, attempts=attempts)
+
+        # check results
+        if 'results' not in data:
+            self.logger.error(f"{method}: 'results' not found in response.json()={data}")
+            return Result(method, settings, 'badPayload', response=data, statusCode=response.status_code, errorClass='KeyError', error="'results' not found in response", latency=latency, attempts=attempts)
+
+        return Result(method, settings, 'ok', response=data, statusCode=response.status_code, latency=latency, attempts=attempts)
+
+    @staticmethod
+    def parseRetryAfter(value):
+        """
+        Retry-After header in seconds, supports delta-seconds and http-date formats
+        """
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(date.timestamp() - time.time(), 0.0)
+
+    def resultItem(self, result, extra=None):
+        """
+        convert Result to item yielded by generators: { 'settings': ..., 'response': ..., 'result': ... }
+        """
+        item = {
+            'settings': result.settings,
+            'response': result.legacyResponse(),
+            'result': result,
+        }
+        if extra:
+            item.update(extra)
+        return item
+
+    def newRetryQueue(self):
+        """
+        empty retry queue of one sweep with settings of self.retryQueue
+        every generator defers its units to own queue, so it drains only units of its sweep
+        """
+        return RetryQueue(maxAttempts=self.retryQueue.maxAttempts, backoffFactor=self.retryQueue.backoffFactor, maxBackoff=self.retryQueue.maxBackoff)
+
+    def fetchUnit(self, settings, method='timeSeriesAnalytics', extra=None, queue=None):
+        """
+        run one work unit and return item for generators
+        if deferRetries is enabled, retryable failures are pushed to queue (default: self.retryQueue) and None is returned
+        """
+        result = getattr(self, method+'Result')(**copy.deepcopy(settings))
+        if self.deferRetries and result.retryable:
+            self.logger.debug(f"fetchUnit: deferring {result}")
+            (self.retryQueue if queue is None else queue).push(result, extra)
+            return None
+        return self.resultItem(result, extra)
+
+    def fetchMany(self, units, method='timeSeriesAnalytics', concurrency=4, queue=None):
+        """
+        run work units concurrently in thread pool, returns iterable object with items in order of units
+        units - iterable of settings dicts or (settings, extra) tuples, consumed lazily
+        requests are limited by client.rateLimiter (threads run in copy of caller context), deferred units (deferRetries) are not yielded,
+        they are pushed to queue (default: self.retryQueue), use drainRetryQueue(queue)
+        """
+
+        units = ( unit if isinstance(unit, tuple) else (unit, None) for unit in units )
+        if concurrency <= 1:
+            for settings, extra in units:
+                item = self.fetchUnit(settings, method, extra, queue)
+                if item:
+                    yield item
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = collections.deque()
+            for settings, extra in units:
+                pending.append(executor.submit(contextvars.copy_context().run, self.fetchUnit, settings, method, extra, queue))
+                if len(pending) < concurrency * 2:
+                    continue
+                item = pending.popleft().result()
+                if item:
+                    yield item
+            while pending:
+                item = pending.popleft().result()
+                if item:
+                    yield item
+
+    def endSweep(self):
+        """
+        called by generators after last item, writes points buffered by client.warehouse
+        """
+        if self.warehouse:
+            self.warehouse.flush()
+
+    def drainRetryQueue(self, queue=None):
+        """
+        retry deferred work units, returns iterable object with items like fetchUnit
+        units which still fail after queue.maxAttempts are yielded with failed result
+        """
+
+        defName = inspect.stack()[0][3]
+        if queue is None:
+            queue = self.retryQueue
+        while len(queue):
+            entry = queue.pop()
+            wait = entry['notBefore'] - time.time()
+            if wait > 0:
+                self.logger.debug(f"{defName}: waiting {wait:.1f}s before retry of method={entry['method']}, attempts={entry['attempts']}")
+                time.sleep(wait)
+            result = getattr(self, entry['method']+'Result')(**copy.deepcopy(entry['settings']))
+            result.attempts += entry['attempts']
+            if result.retryable and result.attempts < queue.maxAttempts:
+                queue.push(result, entry['extra'])
+                continue
+            yield self.resultItem(result, entry['extra'])
@@ -0,0 +1,170 @@
+import datetime
+import threading
+
+from .series import Point, iterPoints, buildResponse, specKey, parseDate, listOf
+
+# measures which are sums over days, week/month values can be derived from daily series
+ADDITIVE_MEASURES = {
+    'impressionsTotal',
+    'pageViewCount',
+    'updates',
+    'units',
+    'redownloads',
+    'totalDownloads',
+    'iap',
+    'proceeds',
+    'sales',
+    'installs',
+    'sessions',
+    'crashes',
+    'uninstalls',
+}
+
+def isDerivable(measure):
+    """
+    True if week/month value of measure can be derived from daily series
+    ratios (conversionRate, crashRate, retention*, bench*) and unique counts (*Unique, payingUsers, activeDevices) are not derivable
+    """
+    return measure in ADDITIVE_MEASURES
+
+def bucketStart(date, frequency, weekStart=6):
+    """
+    first day of week/month bucket for date
+    weekStart - first day of week, datetime.date.weekday() format (0 - monday, 6 - sunday)
+    """
+    if frequency == 'day':
+        return date
+    if frequency == 'week':
+        return date - datetime.timedelta(days=(date.weekday() - weekStart) % 7)
+    if frequency == 'month':
+        return date.replace(day=1)
+    raise Exception(f"unsupported frequency='{frequency}'")
+
+def mergeIntervals(intervals):
+    merged = list()
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + datetime.timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class RollupEngine:
+    """
+    incremental client-side rollups of daily series into week and month
+    engine is filled by daily timeSeriesAnalytics responses (client.sinks) and
+    answers week/month requests for additive measures (client.localSources) without server calls:
+```
+client = appstoreconnect.Client(rollups=True)
+list(client.appAnalytics(appleId))                                      # daily series
+client.timeSeriesAnalytics(appleId, 'units', startTime, endTime, 'week') # answered by client.rollupEngine
+```
+    grouped requests (top-N by rank) are answered only for the same group settings and time interval,
+    because ranking depends on the interval
+    openDays - last days before today which Apple may not have published yet or can still update,
+        they are ingested but not treated as covered, so requests which include them go to server
+    """
+
+    def __init__(self, weekStart=6, openDays=3):
+        self.weekStart = weekStart
+        self.openDays = openDays
+        self.lock = threading.Lock()
+        self.daily = dict()     # { specKey: { (adamId, dimension, option): { date: value } } }
+        self.buckets = dict()   # { (specKey, frequency): { (adamId, dimension, option): { bucketStart: value } } }
+        self.coverage = dict()  # { specKey: [(startDate, endDate), ...] }
+        self.groupRanges = dict() # { specKey: {(startDate, endDate), ...} } for grouped requests
+        self.stats = { 'ingested': 0, 'answered': 0, 'missed': 0 }
+
+    def _interval(self, settings):
+        return parseDate(settings['startTime']), parseDate(settings['endTime'])
+
+    def ingest(self, settings, response):
+        """
+        add daily response to engine, other frequencies are ignored
+        """
+        if settings.get('frequency') != 'day':
+            return
+        startDate, endDate = self._interval(settings)
+        closedEndDate = min(endDate, datetime.date.today() - datetime.timedelta(days=self.openDays))
+        with self.lock:
+            for point in iterPoints(settings, response):
+                key = specKey(settings, measure=point.measure)
+                seriesId = (point.adamId, point.dimension, point.option)
+                date = parseDate(point.date)
+                dates = self.daily.setdefault(key, dict()).setdefault(seriesId, dict())
+                delta = point.value - dates.get(date, 0.0)
+                dates[date] = point.value
+                # update week/month sums incrementally
+                for frequency in ('week', 'month'):
+                    buckets = self.buckets.setdefault((key, frequency), dict()).setdefault(seriesId, dict())
+                    _bucketStart = bucketStart(date, frequency, self.weekStart)
+                    buckets[_bucketStart] = buckets.get(_bucketStart, 0.0) + delta
+                self.stats['ingested'] += 1
+            for measure in listOf(settings['measures']):
+                key = specKey(settings, measure=measure)
+                self.daily.setdefault(key, dict())
+                if closedEndDate < endDate and settings.get('group'):
+                    # ranking of interval with open days can still change
+                    continue
+                if settings.get('group'):
+                    self.groupRanges.setdefault(key, set()).add((startDate, endDate))
+                elif closedEndDate >= startDate:
+                    self.coverage[key] = mergeIntervals(self.coverage.get(key, list()) + [(startDate, closedEndDate)])
+
+    def canAnswer(self, settings):
+        if settings.get('frequency') not in ('week', 'month'):
+            return False
+        measures = listOf(settings['measures'])
+        if len(measures) != 1 or len(listOf(settings['adamId'])) != 1 or not isDerivable(measures[0]):
+            return False
+        key = specKey(settings)
+        startDate, endDate = self._interval(settings)
+        if settings.get('group'):
+            return (startDate, endDate) in self.groupRanges.get(key, set())
+        return any(start <= startDate and endDate <= end for start, end in self.coverage.get(key, list()))
+
+    def answer(self, settings):
+        """
+        time-series response for week/month request derived from daily series, or None if request can't be answered
+        """
+        with self.lock:
+            if not self.canAnswer(settings):
+                if settings.get('frequency') in ('week', 'month'):
+                    self.stats['missed'] += 1
+                return None
+            frequency = settings['frequency']
+            key = specKey(settings)
+            startDate, endDate = self._interval(settings)
+            points = list()
+            for seriesId, dates in self.daily.get(key, dict()).items():
+                buckets = self.buckets[(key, frequency)][seriesId]
+                _bucketStart = bucketStart(startDate, frequency, self.weekStart)
+                while _bucketStart <= endDate:
+                    nextBucketStart = bucketStart(_bucketStart + datetime.timedelta(days=31 if frequency == 'month' else 7), frequency, self.weekStart)
+                    if startDate <= _bucketStart and nextBucketStart - datetime.timedelta(days=1) <= endDate:
+                        # full bucket inside interval
+                        value = buckets.get(_bucketStart, 0.0)
+                    else:
+                        # partial bucket on interval edge
+                        value = sum(v for d,v in dates.items() if max(_bucketStart, startDate) <= d < nextBucketStart and d <= endDate)
+                    adamId, dimension, option = seriesId
+                    points.append(Point(adamId, listOf(settings['measures'])[0], dimension, option, frequency, _bucketStart.isoformat(), value))
+                    _bucketStart = nextBucketStart
+            self.stats['answered'] += 1
+        return buildResponse(points, totals=True)
+
+def rollupResponse(settings, response, frequency, weekStart=6):
+    """
+    convert daily response into week/month response, returns None if measure is not derivable
+    """
+    if not all(isDerivable(measure) for measure in listOf(settings['measures'])):
+        return None
+    points = dict()
+    for point in iterPoints(settings, response):
+        _bucketStart = bucketStart(parseDate(point.date), frequency, weekStart).isoformat()
+        key = (point.adamId, point.measure, point.dimension, point.option, _bucketStart)
+        points[key] = points.get(key, 0.0) + point.value
+    return buildResponse(
+        [ Point(adamId, measure, dimension, option, frequency, date, value) for (adamId, measure, dimension, option, date), value in points.items() ],
+        totals=len(listOf(settings['measures'])) == 1,
+    )
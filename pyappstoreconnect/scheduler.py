@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import inspect
+import logging
+import threading
+import contextvars
+
+from .results import Result
+from .rateLimiter import RequestBudget
+
+class Scheduler:
+    """
+    long-running collection scheduler with priorities, deadlines and global hourly request budget
+    jobs are client method calls, queue and used budget are persisted in stateFile and survive restarts
+    high priority jobs (priority >= highPriority) or jobs close to deadline run first and may use whole budget,
+    low priority jobs run only while less than idleFraction of hourly budget is used, the same is checked before
+    every request of low priority job: while budget is not idle or urgent job is ready, low priority job waits
+    and urgent jobs run first (nested in the same thread)
+    usage:
+```
+def handler(job, item):
+    print(job['id'], item['settings'], item['response'])
+
+scheduler = pyappstoreconnect.Scheduler(client, stateFile='./cache/scheduler.json', hourlyBudget=1000, handler=handler)
+scheduler.submit('timeSeriesAnalyticsResult', appleId, 'units', frequency='day', days=1, priority=100, every=3600)
+scheduler.submit('timeSeriesAnalyticsResult', appleId, 'proceeds', frequency='day', days=1, priority=100, every=3600)
+scheduler.submit('appAnalytics', appleId, days=28, priority=1, every=86400, cost=150)
+scheduler.run()
+```
+    days - for methods without days argument (timeSeriesAnalytics*), startTime/endTime are set from client.timeInterval(days) on every run
+    """
+
+    def __init__(self, client, stateFile, hourlyBudget=1000, handler=None, highPriority=50, idleFraction=0.5, deadlineHorizon=900, maxAttempts=3, retryDelay=300):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.stateFile = stateFile
+        self.budget = RequestBudget(hourlyBudget)
+        self.handler = handler
+        self.highPriority = highPriority
+        self.idleFraction = idleFraction
+        self.deadlineHorizon = deadlineHorizon
+        self.maxAttempts = maxAttempts
+        self.retryDelay = retryDelay
+        self.jobs = dict()
+        # job of current thread, client copies context to its request threads, urgent jobs which pre-empt
+        # low priority job set it only in thread which runs them
+        self.currentJob = contextvars.ContextVar(f"schedulerJob{id(self)}", default=None)
+        self.lock = threading.RLock()
+        self.preemptLock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.load()
+        # every request of client goes through scheduler budget {{
+        self.clientRateLimiter = client.rateLimiter
+        client.rateLimiter = self
+        # }}
+
+    # state {{
+    def load(self):
+        if not os.path.exists(self.stateFile) or os.path.getsize(self.stateFile) == 0:
+            return
+        with open(self.stateFile, 'r') as f:
+            state = json.load(f)
+        for job in state.get('jobs', list()):
+            if job['status'] == 'running':
+                # scheduler stopped while job was running, run it again
+                job['status'] = 'pending'
+            self.jobs[job['id']] = job
+        now = time.time()
+        self.budget.requests.extend(sorted(t for t in state.get('budget', list()) if t > now - self.budget.window))
+
+    def save(self):
+        with self.lock:
+            state = {
+                'jobs': list(self.jobs.values()),
+                'budget': list(self.budget.requests),
+            }
+            tmpFile = self.stateFile + '.tmp'
+            with open(tmpFile, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmpFile, self.stateFile)
+    # }}
+
+    # budget {{
+    def acquire(self, tokens=1):
+        """
+        called by client before every request
+        """
+        job = self.currentJob.get()
+        if job is not None and not self.urgent(job, time.time()):
+            self.acquireIdle(job, tokens)
+            if self.clientRateLimiter:
+                self.clientRateLimiter.acquire(tokens)
+            return
+        if self.clientRateLimiter:
+            self.clientRateLimiter.acquire(tokens)
+        self.budget.acquire(tokens)
+
+    def acquireIdle(self, job, tokens=1, pollInterval=1):
+        """
+        budget for request of low priority job, waits until less than idleFraction of budget is used,
+        urgent jobs which are ready meanwhile are run before request is sent
+        """
+
+        defName = inspect.stack()[0][3]
+        idleLimit = self.idleLimit()
+        while True:
+            if self.stopEvent.is_set():
+                raise Exception(f"scheduler stopped, job={job['id']}")
+            # only one thread of client (concurrent requests of job) runs urgent jobs
+            if self.preemptLock.acquire(blocking=False):
+                try:
+                    urgentJob = self.next(urgentOnly=True)
+                    if urgentJob is not None:
+                        self.logger.info(f"{defName}: job={urgentJob['id']} pre-empts job={job['id']}")
+                        self.runJob(urgentJob)
+                        continue
+                finally:
+                    self.preemptLock.release()
+            if self.budget.tryAcquire(tokens, limit=idleLimit):
+                return
+            self.stopEvent.wait(pollInterval)
+
+    def idleLimit(self):
+        """
+        number of requests in budget window which low priority jobs may use
+        """
+        return int(self.idleFraction * self.budget.limit)
+    # }}
+
+    def submit(self, method, *args, priority=0, deadline=None, every=None, days=None, cost=1, jobId=None, **kwargs):
+        """
+        add job to queue, returns job id
+        priority - bigger runs first
+        deadline - unix time when job should be done
+        every    - repeat job every seconds after start of previous run
+        cost     - estimated number of requests, low priority job starts only when cost fits into unused idle share of budget
+        """
+        job = {
+            'id': jobId or uuid.uuid4().hex,
+            'method': method,
+            'args': list(args),
+            'kwargs': kwargs,
+            'priority': priority,
+            'deadline': deadline,
+            'every': every,
+            'days': days,
+            'cost': cost,
+            'notBefore': time.time(),
+            'status': 'pending',
+            'attempts': 0,
+            'lastRun': None,
+            'lastError': None,
+        }
+        with self.lock:
+            self.jobs[job['id']] = job
+            self.save()
+        return job['id']
+
+    def cancel(self, jobId):
+        with self.lock:
+            self.jobs.pop(jobId, None)
+            self.save()
+
+    def urgent(self, job, now):
+        return job['priority'] >= self.highPriority or (job['deadline'] is not None and job['deadline'] - now <= self.deadlineHorizon)
+
+    def next(self, urgentOnly=False):
+        """
+        choose job to run now or None
+        urgentOnly - choose only from high priority jobs and jobs close to deadline
+        """
+        now = time.time()
+        used = self.budget.used()
+        remaining = max(self.budget.limit - used, 0)
+        # every request of low priority job is limited by idleLimit, see acquireIdle()
+        idleRemaining = self.idleLimit() - used
+        with self.lock:
+            ready = [ job for job in self.jobs.values() if job['status'] == 'pending' and job['notBefore'] <= now ]
+            candidates = list()
+            for job in ready:
+                if self.urgent(job, now):
+                    if remaining > 0:
+                        candidates.append(job)
+                elif not urgentOnly and idleRemaining > 0 and job['cost'] <= idleRemaining:
+                    candidates.append(job)
+            if not candidates:
+                return None
+            return min(candidates, key=lambda job: (
+                not self.urgent(job, now),
+                -job['priority'],
+                job['deadline'] if job['deadline'] is not None else float('inf'),
+                job['notBefore'],
+            ))
+
+    def runJob(self, job):
+        defName = inspect.stack()[0][3]
+        with self.lock:
+            job['status'] = 'running'
+            job['attempts'] += 1
+            job['lastRun'] = time.time()
+            self.save()
+        kwargs = dict(job['kwargs'])
+        if job['days'] is not None:
+            timeInterval = self.client.timeInterval(job['days'])
+            if job['method'].startswith('timeSeriesAnalytics'):
+                kwargs.update(timeInterval)
+            else:
+                kwargs['days'] = job['days']
+        self.logger.info(f"{defName}: job={job['id']}, method={job['method']}, priority={job['priority']}, budget used={self.budget.used()}/{self.budget.limit}")
+        token = self.currentJob.set(job)
+        try:
+            try:
+                items = getattr(self.client, job['method'])(*job['args'], **kwargs)
+                if isinstance(items, Result):
+                    items = [self.client.resultItem(items)]
+                elif isinstance(items, dict) or items is None or items is False:
+                    items = [items]
+                for item in items:
+                    if self.handler:
+                        self.handler(job, item)
+            finally:
+                self.currentJob.reset(token)
+        except Exception as e:
+            self.logger.error(f"{defName}: job={job['id']}, method={job['method']}, error={str(e)}")
+            with self.lock:
+                job['lastError'] = str(e)
+                if job['attempts'] < self.maxAttempts:
+                    job['status'] = 'pending'
+                    job['notBefore'] = time.time() + self.retryDelay * job['attempts']
+                elif job['every']:
+                    job['status'] = 'pending'
+                    job['attempts'] = 0
+                    job['notBefore'] = job['lastRun'] + job['every']
+                else:
+                    job['status'] = 'failed'
+                self.save()
+            return False
+
+        with self.lock:
+            job['lastError'] = None
+            job['attempts'] = 0
+            if job['every']:
+                job['status'] = 'pending'
+                job['notBefore'] = job['lastRun'] + job['every']
+            else:
+                job['status'] = 'done'
+                self.jobs.pop(job['id'], None)
+            self.save()
+        return True
+
+    def runOnce(self):
+        """
+        run one job if any can run now, returns True if job was run
+        """
+        job = self.next()
+        if job is None:
+            return False
+        self.runJob(job)
+        return True
+
+    def run(self, forever=True, idleSleep=30):
+        """
+        run jobs until stop() or until queue has no jobs to run now if forever is False
+        """
+        while not self.stopEvent.is_set():
+            if self.runOnce():
+                continue
+            if not forever:
+                return
+            self.stopEvent.wait(idleSleep)
+
+    def stop(self):
+        self.stopEvent.set()
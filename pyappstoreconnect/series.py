@@ -0,0 +1,114 @@
+import json
+import datetime
+import collections
+
+# one data point of time-series response
+# dimension/option are '' for not grouped and not filtered series
+Point = collections.namedtuple('Point', ['adamId', 'measure', 'dimension', 'option', 'frequency', 'date', 'value'])
+
+def parseDate(value):
+    """
+    '2024-10-11T00:00:00Z' or '2024-10-11' -> datetime.date
+    """
+    return datetime.date.fromisoformat(value[:10])
+
+def formatDate(date):
+    """
+    datetime.date -> '2024-10-11T00:00:00Z'
+    """
+    return date.strftime("%Y-%m-%dT00:00:00Z")
+
+def listOf(value):
+    if isinstance(value, list):
+        return value
+    return [value]
+
+def filterSpec(settings):
+    """
+    (dimension, option) from dimensionFilters of request settings
+    """
+    dimensionFilters = settings.get('dimensionFilters') or list()
+    if not dimensionFilters:
+        return '', ''
+    dimensions = [ str(_filter['dimensionKey']) for _filter in dimensionFilters ]
+    options = [ ','.join(str(option) for option in _filter['optionKeys']) for _filter in dimensionFilters ]
+    return '|'.join(dimensions), '|'.join(options)
+
+def specKey(settings, measure=None, adamId=None):
+    """
+    stable key of request settings without time interval and frequency
+    """
+    if measure is None:
+        measure = listOf(settings['measures'])
+    if adamId is None:
+        adamId = listOf(settings['adamId'])
+    return json.dumps({
+        'adamId': [ str(_adamId) for _adamId in listOf(adamId) ],
+        'measures': listOf(measure),
+        'dimensionFilters': settings.get('dimensionFilters') or list(),
+        'group': settings.get('group'),
+    }, sort_keys=True)
+
+def iterPoints(settings, response):
+    """
+    flatten time-series response into Point tuples
+    for grouped response dimension is group dimension and option is group key,
+    nested values (benchmark percentiles, etc...) are flattened into measure 'measure.key'
+    """
+    if not response or 'results' not in response:
+        return
+    measures = listOf(settings['measures'])
+    frequency = settings.get('frequency', '')
+    group = settings.get('group')
+    filterDimension, filterOption = filterSpec(settings)
+    defaultAdamId = str(listOf(settings['adamId'])[0])
+    for result in response['results']:
+        adamId = str(result.get('adamId') or defaultAdamId)
+        if group:
+            dimension = group['dimension']
+            option = str((result.get('group') or dict()).get('key', ''))
+        else:
+            dimension, option = filterDimension, filterOption
+        for point in result.get('data') or list():
+            date = point['date'][:10]
+            for measure in measures:
+                value = point.get(measure)
+                if value is None:
+                    continue
+                if isinstance(value, dict):
+                    for subKey, subValue in value.items():
+                        if isinstance(subValue, (int, float)):
+                            yield Point(adamId, f"{measure}.{subKey}", dimension, option, frequency, date, float(subValue))
+                    continue
+                yield Point(adamId, measure, dimension, option, frequency, date, float(value))
+
+def buildResponse(points, titles=dict(), totals=False):
+    """
+    build time-series shaped response from Point tuples (reverse of iterPoints), 'measure.key' points are nested back
+    titles - { option: title } for group titles
+    totals - add 'totals' with sum of values, only valid for additive measures
+    """
+    series = collections.OrderedDict()
+    for point in points:
+        key = (point.adamId, point.dimension, point.option)
+        values = series.setdefault(key, dict()).setdefault(point.date, dict())
+        if '.' in point.measure:
+            # nested value flattened by iterPoints
+            measure, subKey = point.measure.split('.', 1)
+            values.setdefault(measure, dict())[subKey] = point.value
+        else:
+            values[point.measure] = point.value
+    results = list()
+    for (adamId, dimension, option), dates in series.items():
+        result = {
+            'adamId': adamId,
+            'data': [ dict({ 'date': date+"T00:00:00Z" }, **values) for date,values in sorted(dates.items()) ],
+        }
+        if dimension and option:
+            result['group'] = { 'key': option, 'title': titles.get(option, option) }
+        measures = { measure for values in dates.values() for measure in values }
+        if totals and len(measures) == 1:
+            measure = measures.pop()
+            result['totals'] = { 'key': measure, 'value': sum(values[measure] for values in dates.values()) }
+        results.append(result)
+    return { 'size': len(results), 'results': results }
@@ -0,0 +1,225 @@
+import os
+import sys
+import mmap
+import json
+import array
+import struct
+import inspect
+import logging
+import datetime
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .series import Point, iterPoints
+
+# file layout (little endian):
+#   header: magic, version, number of series, length of index
+#   index:  json list of [label, offset, length], label is (adamId, measure, dimension, option, frequency),
+#           offset is relative to start of data
+#   data:   for every series int32 dates block (days since 1970-01-01) and float64 values block,
+#           blocks are aligned to 8 bytes
+MAGIC = b'ASCS'
+VERSION = 1
+HEADER = struct.Struct('<4sIIxxxxQ')
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def dayNumber(date):
+    """
+    'YYYY-MM-DD' -> days since 1970-01-01
+    """
+    return datetime.date.fromisoformat(date[:10]).toordinal() - EPOCH
+
+def dayString(number):
+    """
+    days since 1970-01-01 -> 'YYYY-MM-DD'
+    """
+    return datetime.date.fromordinal(int(number) + EPOCH).isoformat()
+
+def writeSeriesCache(path, series):
+    """
+    write series cache file atomically
+    series - { label: { 'YYYY-MM-DD': value } }, label is (adamId, measure, dimension, option, frequency)
+    """
+    if sys.byteorder != 'little':
+        raise Exception(f"unsupported byte order={sys.byteorder}")
+    index = list()
+    blocks = list()
+    offset = 0
+    for label in sorted(series):
+        points = sorted((dayNumber(date), value) for date, value in series[label].items())
+        dates = array.array('i', [ point[0] for point in points ]).tobytes()
+        values = array.array('d', [ point[1] for point in points ]).tobytes()
+        index.append([list(label), offset, len(points)])
+        blocks.append(dates + b'\0' * (_align(len(dates)) - len(dates)))
+        blocks.append(values)
+        offset += _align(len(dates)) + len(values)
+    header = json.dumps(index, separators=(',', ':')).encode()
+    dataOffset = _align(HEADER.size + len(header))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path+'.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index), len(header)))
+        f.write(header)
+        f.write(b'\0' * (dataOffset - HEADER.size - len(header)))
+        for block in blocks:
+            f.write(block)
+    os.replace(path+'.tmp', path)
+
+class SeriesCache:
+    """
+    memory mapped binary cache of time series, reads are zero-copy views of mapped file:
+    memoryview (format 'i' for dates, 'd' for values) or read only numpy arrays with asArray=True
+    fetched timeSeriesAnalytics responses are buffered by ingest() (client.sinks) and merged into file by flush()
+    usage:
+```
+client = appstoreconnect.Client(seriesCachePath='./cache/series.bin')
+...
+client.seriesCache.flush()
+cache = pyappstoreconnect.SeriesCache('./cache/series.bin')
+for label in cache.labels(measure='units'):
+    dates, values = cache.series(label, asArray=True)
+```
+    views stay valid after flush() replaced file, close() fails while views of current file are alive
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.lock = threading.RLock()
+        self.pending = dict() # { label: { date: value } }
+        self.file = None
+        self.mmap = None
+        self.view = None
+        self.index = dict() # { label: (offset, length) }
+        self.dataOffset = 0
+        self.open()
+
+    # mapping {{
+    def open(self):
+        """
+        map cache file, missing file is empty cache
+        """
+
+        defName = inspect.stack()[0][3]
+        with self.lock:
+            self.file = self.mmap = self.view = None
+            self.index = dict()
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                return
+            self.file = open(self.path, 'rb')
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, headerLength = HEADER.unpack_from(self.mmap, 0)
+            if magic != MAGIC or version != VERSION:
+                message = f"unsupported series cache file={self.path}, magic={magic}, version={version}"
+                self.logger.error(f"{defName}: {message}")
+                raise Exception(message)
+            for label, offset, length in json.loads(self.mmap[HEADER.size:HEADER.size+headerLength]):
+                self.index[tuple(label)] = (offset, length)
+            self.dataOffset = _align(HEADER.size + headerLength)
+            self.view = memoryview(self.mmap)
+            self.logger.debug(f"{defName}: path={self.path}, series={count}")
+
+    def close(self):
+        with self.lock:
+            if self.view is not None:
+                self.view.release()
+                self.mmap.close()
+                self.file.close()
+            self.file = self.mmap = self.view = None
+            self.index = dict()
+    # }}
+
+    # read {{
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, label):
+        return tuple(label) in self.index
+
+    def labels(self, adamId=None, measure=None, dimension=None, option=None, frequency=None):
+        """
+        labels of series matching all not None arguments
+        """
+        match = { 0: adamId, 1: measure, 2: dimension, 3: option, 4: frequency }
+        return [ label for label in self.index if all(value is None or label[position] == value for position,value in match.items()) ]
+
+    @staticmethod
+    def _requireNumpy():
+        if numpy is None:
+            raise Exception("numpy is required for asArray=True, install it with 'pip install pyappstoreconnect[frame]'")
+
+    def _block(self, label):
+        offset, length = self.index[tuple(label)]
+        start = self.dataOffset + offset
+        return start, start + _align(length * 4), length
+
+    def dates(self, label, asArray=False):
+        """
+        dates of series as days since 1970-01-01, see dayString()
+        """
+        start, _, length = self._block(label)
+        if asArray:
+            self._requireNumpy()
+            return numpy.frombuffer(self.mmap, dtype='<i4', count=length, offset=start)
+        return self.view[start:start+length*4].cast('i')
+
+    def values(self, label, asArray=False):
+        _, start, length = self._block(label)
+        if asArray:
+            self._requireNumpy()
+            return numpy.frombuffer(self.mmap, dtype='<f8', count=length, offset=start)
+        return self.view[start:start+length*8].cast('d')
+
+    def series(self, label, asArray=False):
+        """
+        (dates, values) views of series
+        """
+        return self.dates(label, asArray=asArray), self.values(label, asArray=asArray)
+
+    def points(self, label):
+        """
+        Point tuples of series (copy)
+        """
+        adamId, measure, dimension, option, frequency = label
+        dates, values = self.series(label)
+        return [ Point(adamId, measure, dimension, option, frequency, dayString(date), value) for date, value in zip(dates, values) ]
+    # }}
+
+    # write {{
+    def ingest(self, settings, response):
+        """
+        buffer data points of response, written by flush()
+        """
+        with self.lock:
+            for point in iterPoints(settings, response):
+                self.pending.setdefault(tuple(point[:5]), dict())[point.date] = point.value
+
+    def flush(self):
+        """
+        merge buffered points into cache file and map new file
+        """
+
+        defName = inspect.stack()[0][3]
+        with self.lock:
+            if not self.pending:
+                return
+            series = dict()
+            for label in self.index:
+                dates, values = self.series(label)
+                series[label] = { dayString(date): value for date, value in zip(dates, values) }
+            for label, points in self.pending.items():
+                series.setdefault(label, dict()).update(points)
+            writeSeriesCache(self.path, series)
+            self.logger.debug(f"{defName}: path={self.path}, series={len(series)}, updated={len(self.pending)}")
+            self.pending = dict()
+            # previous mapping is left to garbage collector, views of it may be alive
+            self.open()
+    # }}
@@ -7,7 +7,7 @@ class SettingsMixin:
         """
 
         defName = inspect.stack()[0][3]
-        url=f"https://appstoreconnect.apple.com/analytics/api/v1/settings/all"
+        url=f"{self.appStoreConnectUrl}/analytics/api/v1/settings/all"
         response = self.session.get(url)
 
         # check status_code
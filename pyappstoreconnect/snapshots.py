@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import inspect
+import logging
+import threading
+import collections
+
+from .series import Point, iterPoints, buildResponse, specKey
+
+class SnapshotStore:
+    """
+    audit history of time-series responses with delta compression
+    every snapshot of series (same request settings without time interval) is stored as difference
+    from previous snapshot of the same series: changed and new points, removed points,
+    full keyframe is stored every keyframeInterval snapshots or when delta is not smaller than full state,
+    so snapshot is rebuilt from one keyframe and at most keyframeInterval-1 deltas
+    usage:
+```
+client = appstoreconnect.Client(snapshotPath='./cache/snapshots.sqlite')
+for item in client.appAnalytics(appleId):
+    ...
+for snapshot in client.snapshots.history(item['settings']):
+    print(snapshot['taken'], snapshot['points'])
+data = client.snapshots.response(snapshot['id'])
+```
+    """
+
+    def __init__(self, path, keyframeInterval=14, maxStates=256, compressLevel=6):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.keyframeInterval = keyframeInterval
+        self.maxStates = maxStates
+        self.compressLevel = compressLevel
+        self.lock = threading.RLock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS series (
+                    id INTEGER PRIMARY KEY,
+                    spec TEXT NOT NULL,
+                    frequency TEXT NOT NULL,
+                    UNIQUE (spec, frequency)
+                )
+            """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY,
+                    series INTEGER NOT NULL,
+                    taken REAL NOT NULL,
+                    startTime TEXT,
+                    endTime TEXT,
+                    keyframe INTEGER NOT NULL,
+                    base INTEGER,
+                    points INTEGER NOT NULL,
+                    changed INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS snapshotsSeries ON snapshots (series, id)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS snapshotsBase ON snapshots (base, id)")
+        # last state of series: { seriesId: (snapshotId, base, deltas, state) }
+        self.states = collections.OrderedDict()
+        self.stats = { 'snapshots': 0, 'keyframes': 0, 'deltas': 0, 'unchanged': 0, 'rawBytes': 0, 'storedBytes': 0 }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    # encoding {{
+    def _encode(self, value):
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode(), self.compressLevel)
+
+    def _decode(self, data):
+        return json.loads(zlib.decompress(data))
+
+    @staticmethod
+    def _state(settings, response):
+        """
+        { (adamId, measure, dimension, option, date): value } of response
+        """
+        return { (point.adamId, point.measure, point.dimension, point.option, point.date): point.value for point in iterPoints(settings, response) }
+    # }}
+
+    def _seriesId(self, settings, create=True):
+        spec = specKey(settings)
+        frequency = settings.get('frequency', '')
+        row = self.connection.execute("SELECT id FROM series WHERE spec=? AND frequency=?", (spec, frequency)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+        return self.connection.execute("INSERT INTO series (spec, frequency) VALUES (?, ?)", (spec, frequency)).lastrowid
+
+    def _last(self, seriesId):
+        """
+        (snapshotId, base, deltas since keyframe, state) of last snapshot of series or None
+        """
+        if seriesId in self.states:
+            self.states.move_to_end(seriesId)
+            return self.states[seriesId]
+        row = self.connection.execute("SELECT id, base FROM snapshots WHERE series=? ORDER BY id DESC LIMIT 1", (seriesId,)).fetchone()
+        if row is None:
+            return None
+        snapshotId, base = row
+        deltas = self.connection.execute("SELECT COUNT(*) FROM snapshots WHERE base=? AND id<=? AND keyframe=0", (base, snapshotId)).fetchone()[0]
+        return self._remember(seriesId, (snapshotId, base, deltas, self.state(snapshotId)))
+
+    def _remember(self, seriesId, last):
+        self.states[seriesId] = last
+        self.states.move_to_end(seriesId)
+        while len(self.states) > self.maxStates:
+            self.states.popitem(last=False)
+        return last
+
+    # write {{
+    def ingest(self, settings, response, taken=None):
+        """
+        store snapshot of response, returns snapshot id
+        """
+
+        defName = inspect.stack()[0][3]
+        taken = time.time() if taken is None else taken
+        state = self._state(settings, response)
+        rawSize = len(json.dumps(response, separators=(',', ':')))
+        with self.lock, self.connection:
+            seriesId = self._seriesId(settings)
+            last = self._last(seriesId)
+            data = None
+            if last is not None and last[2] + 1 < self.keyframeInterval:
+                previous = last[3]
+                changed = [ list(key) + [value] for key, value in state.items() if key not in previous or previous[key] != value ]
+                removed = [ list(key) for key in previous if key not in state ]
+                # delta which is not smaller than full state starts new keyframe
+                if len(changed) + len(removed) < len(state):
+                    data, base, deltas, changedCount = self._encode({ 'set': changed, 'del': removed }), last[1], last[2] + 1, len(changed) + len(removed)
+            if data is None:
+                data, base, deltas, changedCount = self._encode([ list(key) + [value] for key, value in state.items() ]), None, 0, len(state)
+            snapshotId = self.connection.execute(
+                "INSERT INTO snapshots (series, taken, startTime, endTime, keyframe, base, points, changed, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (seriesId, taken, settings.get('startTime'), settings.get('endTime'), int(base is None), base, len(state), changedCount, data),
+            ).lastrowid
+            if base is None:
+                base = snapshotId
+                self.connection.execute("UPDATE snapshots SET base=? WHERE id=?", (base, snapshotId))
+                self.stats['keyframes'] += 1
+            else:
+                self.stats['deltas'] += 1
+                if not changedCount:
+                    self.stats['unchanged'] += 1
+            self._remember(seriesId, (snapshotId, base, deltas, state))
+            self.stats['snapshots'] += 1
+            self.stats['rawBytes'] += rawSize
+            self.stats['storedBytes'] += len(data)
+        self.logger.debug(f"{defName}: snapshot={snapshotId}, series={seriesId}, keyframe={base == snapshotId}, points={len(state)}, changed={changedCount}, bytes={len(data)}")
+        return snapshotId
+    # }}
+
+    # read {{
+    def history(self, settings):
+        """
+        list of snapshots of series of request settings, oldest first
+        """
+        with self.lock:
+            seriesId = self._seriesId(settings, create=False)
+            if seriesId is None:
+                return list()
+            rows = self.connection.execute("SELECT id, taken, startTime, endTime, keyframe, points, changed, LENGTH(data) FROM snapshots WHERE series=? ORDER BY id", (seriesId,)).fetchall()
+        return [
+            { 'id': row[0], 'taken': row[1], 'startTime': row[2], 'endTime': row[3], 'keyframe': bool(row[4]), 'points': row[5], 'changed': row[6], 'bytes': row[7] }
+            for row in rows
+        ]
+
+    def state(self, snapshotId):
+        """
+        { (adamId, measure, dimension, option, date): value } of snapshot, rebuilt from keyframe and deltas
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT base FROM snapshots WHERE id=?", (snapshotId,)).fetchone()
+            if row is None:
+                raise Exception(f"snapshot={snapshotId} not found")
+            rows = self.connection.execute("SELECT keyframe, data FROM snapshots WHERE base=? AND id<=? ORDER BY id", (row[0], snapshotId)).fetchall()
+        state = dict()
+        for keyframe, data in rows:
+            data = self._decode(data)
+            if keyframe:
+                state = { tuple(point[:5]): point[5] for point in data }
+                continue
+            for key in data['del']:
+                state.pop(tuple(key), None)
+            for point in data['set']:
+                state[tuple(point[:5])] = point[5]
+        return state
+
+    def points(self, snapshotId):
+        with self.lock:
+            row = self.connection.execute("SELECT frequency FROM series WHERE id=(SELECT series FROM snapshots WHERE id=?)", (snapshotId,)).fetchone()
+        frequency = row[0] if row else ''
+        return [ Point(adamId, measure, dimension, option, frequency, date, value) for (adamId, measure, dimension, option, date), value in sorted(self.state(snapshotId).items()) ]
+
+    def response(self, snapshotId):
+        """
+        time-series shaped response of snapshot
+        """
+        return buildResponse(self.points(snapshotId))
+
+    def at(self, settings, taken):
+        """
+        response of last snapshot of series taken at or before timestamp, None if there is no such snapshot
+        """
+        with self.lock:
+            seriesId = self._seriesId(settings, create=False)
+            if seriesId is None:
+                return None
+            row = self.connection.execute("SELECT id FROM snapshots WHERE series=? AND taken<=? ORDER BY taken DESC, id DESC LIMIT 1", (seriesId, taken)).fetchone()
+        if row is None:
+            return None
+        return self.response(row[0])
+    # }}
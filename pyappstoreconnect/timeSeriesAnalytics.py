@@ -1,13 +1,13 @@
-import inspect
-import json
+from .results import Result
 
 class TimeSeriesAnalyticsMixin:
-    def timeSeriesAnalytics(self, adamId, measures, startTime, endTime, frequency, group=None, dimensionFilters=list(), apiVersion='v1'):
+    def timeSeriesAnalyticsRequest(self, settings):
         """
-        https://github.com/fastlane/fastlane/blob/master/spaceship/lib/spaceship/tunes/tunes_client.rb#L633
+        url and payload of time-series request for settings (arguments of timeSeriesAnalytics)
         """
 
-        defName = inspect.stack()[0][3]
+        adamId = settings['adamId']
+        measures = settings['measures']
         if not isinstance(adamId, list):
             adamId = [adamId]
         if not isinstance(measures, list):
@@ -16,35 +16,55 @@ class TimeSeriesAnalyticsMixin:
         payload = {
             "adamId": adamId,
             "measures": measures,
-            "dimensionFilters": dimensionFilters,
-            "startTime": startTime,
-            "endTime": endTime,
-            "frequency": frequency,
+            "dimensionFilters": settings.get('dimensionFilters') or list(),
+            "startTime": settings['startTime'],
+            "endTime": settings['endTime'],
+            "frequency": settings['frequency'],
         }
-        if group != None:
-            payload['group'] = group
-        headers = {
-            "X-Requested-By": "appstoreconnect.apple.com",
+        if settings.get('group') != None:
+            payload['group'] = settings['group']
+        apiVersion = settings.get('apiVersion', 'v1')
+        url=f"{self.appStoreConnectUrl}/analytics/api/{apiVersion}/data/time-series"
+        return url, payload
+
+    def timeSeriesAnalyticsResult(self, adamId, measures, startTime, endTime, frequency, group=None, dimensionFilters=list(), apiVersion='v1', localSources=True):
+        """
+        same as timeSeriesAnalytics, but returns Result object with status, error class, latency and attempts
+        localSources - allow answer from client.localSources (rollups, warehouse, etc...) without server call
+        """
+
+        settings = {
+            'adamId': adamId,
+            'measures': measures,
+            'startTime': startTime,
+            'endTime': endTime,
+            'frequency': frequency,
+            'group': group,
+            'dimensionFilters': dimensionFilters,
+            'apiVersion': apiVersion,
         }
-        url=f"https://appstoreconnect.apple.com/analytics/api/{apiVersion}/data/time-series"
-        self.logger.debug(f"{defName}: payload={json.dumps(payload)}")
-        response = self.session.post(url, json=payload, headers=headers)
-
-        # check status_code
-        if response.status_code != 200:
-            self.logger.error(f"{defName}: status_code={response.status_code}, payload={payload}, response.text={response.text}")
-            return False
-
-        # check json data
-        try:
-            data = response.json()
-        except Exception as e:
-            self.logger.error(f"{defName}: failed get response.json(), error={str(e)}")
-            return None
-
-        # check results
-        if 'results' not in data:
-            self.logger.error(f"{defName}: 'results' not found in response.json()={data}")
-            return False
-
-        return data
+        # answer from local sources (rollups, etc...) without server call {{
+        for localSource in (self.localSources if localSources else list()):
+            data = localSource.answer(settings)
+            if data is not None:
+                self.logger.debug(f"timeSeriesAnalytics: answered by {type(localSource).__name__}, settings={settings}")
+                return Result('timeSeriesAnalytics', settings, 'ok', response=data, attempts=0, source='local')
+        # }}
+
+        url, payload = self.timeSeriesAnalyticsRequest(settings)
+        result = self.postResult('timeSeriesAnalytics', url, payload, settings)
+        if result.ok:
+            for sink in self.sinks:
+                sink.ingest(settings, result.response)
+        return result
+
+    def timeSeriesAnalytics(self, adamId, measures, startTime, endTime, frequency, group=None, dimensionFilters=list(), apiVersion='v1'):
+        """
+        https://github.com/fastlane/fastlane/blob/master/spaceship/lib/spaceship/tunes/tunes_client.rb#L633
+        returns response.json() on success, None if response is not json, False on other errors
+        """
+
+        result = self.timeSeriesAnalyticsResult(adamId, measures, startTime, endTime, frequency, group=group, dimensionFilters=dimensionFilters, apiVersion=apiVersion)
+        if result.status == 'networkError':
+            raise result.exception
+        return result.legacyResponse()
@@ -0,0 +1,272 @@
+import os
+import time
+import json
+import sqlite3
+import inspect
+import logging
+import datetime
+import threading
+
+from .results import Result
+from .series import Point, iterPoints, buildResponse, specKey, filterSpec, parseDate, formatDate, listOf
+from .rollups import isDerivable, mergeIntervals
+
+class Warehouse:
+    """
+    local sqlite store of time-series data points
+    every successful timeSeriesAnalytics response is upserted (client.sinks), requests which are fully covered
+    by stored data are answered without server call (client.localSources), partially covered requests are
+    completed with network requests for missing days only by timeSeriesAnalytics()
+    usage:
+```
+client = appstoreconnect.Client(warehousePath='./cache/warehouse.sqlite')
+...
+data = client.warehouse.timeSeriesAnalytics(client, appleId, 'units', startTime, endTime, 'day')
+client.warehouse.close() # write buffered points, also done at the end of every sweep and at exit
+```
+    openDays - last days before today which Apple can still update, they are stored but not treated as covered
+    grouped requests (top-N by rank) are answered only for the same group settings and time interval
+    local answers are built from stored points: group keys, titles, data and totals (additive measures only),
+    'meetsThreshold', 'type' of totals and other response fields are not stored
+    """
+
+    def __init__(self, path, batchSize=5000, openDays=3):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.batchSize = batchSize
+        self.openDays = openDays
+        self.lock = threading.RLock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS points (
+                    adamId TEXT NOT NULL,
+                    measure TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    option TEXT NOT NULL,
+                    frequency TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    value REAL,
+                    updated REAL,
+                    PRIMARY KEY (adamId, measure, dimension, option, frequency, date)
+                ) WITHOUT ROWID
+            """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS coverage (
+                    spec TEXT NOT NULL,
+                    frequency TEXT NOT NULL,
+                    startDate TEXT NOT NULL,
+                    endDate TEXT NOT NULL,
+                    options TEXT,
+                    updated REAL
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS coverageSpec ON coverage (spec, frequency)")
+        self.pendingPoints = list()
+        self.pendingCoverage = list()
+        self.stats = { 'upserted': 0, 'answered': 0, 'partial': 0, 'missed': 0, 'fetched': 0 }
+
+    def close(self):
+        """
+        write buffered points and close database, registered with atexit by client
+        """
+        with self.lock:
+            if self.connection is None:
+                return
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    # write {{
+    def ingest(self, settings, response):
+        """
+        buffer data points of response, written in batches by flush()
+        """
+        now = time.time()
+        startDate, endDate = parseDate(settings['startTime']), parseDate(settings['endTime'])
+        with self.lock:
+            titles = { str(result['group'].get('key', '')): result['group'].get('title') for result in response.get('results') or list() if result.get('group') }
+            options = dict() # { measure: { option: title } }, dict keeps rank order of groups
+            for point in iterPoints(settings, response):
+                self.pendingPoints.append(point + (now,))
+                # nested values are stored as 'measure.key'
+                options.setdefault(point.measure.split('.')[0], dict())[point.option] = titles.get(point.option)
+            for measure in listOf(settings['measures']):
+                spec = specKey(settings, measure=measure)
+                if settings.get('group'):
+                    # grouped request: remember returned groups for exact interval
+                    self.pendingCoverage.append((spec, settings['frequency'], startDate.isoformat(), endDate.isoformat(), json.dumps(list(options.get(measure, dict()).items())), now))
+                    continue
+                closedEndDate = min(endDate, datetime.date.today() - datetime.timedelta(days=self.openDays))
+                if closedEndDate >= startDate:
+                    self.pendingCoverage.append((spec, settings['frequency'], startDate.isoformat(), closedEndDate.isoformat(), None, now))
+            if len(self.pendingPoints) >= self.batchSize:
+                self.flush()
+
+    def flush(self):
+        """
+        write buffered points and coverage in one transaction
+        """
+        with self.lock:
+            if self.connection is None or not self.pendingPoints and not self.pendingCoverage:
+                return
+            with self.connection:
+                self.connection.executemany("""
+                    INSERT INTO points (adamId, measure, dimension, option, frequency, date, value, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (adamId, measure, dimension, option, frequency, date) DO UPDATE SET value=excluded.value, updated=excluded.updated
+                """, self.pendingPoints)
+                for row in self.pendingCoverage:
+                    spec, frequency, startDate, endDate, options, updated = row
+                    if options is not None:
+                        self.connection.execute("DELETE FROM coverage WHERE spec=? AND frequency=? AND startDate=? AND endDate=?", (spec, frequency, startDate, endDate))
+                        self.connection.execute("INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?)", row)
+                        continue
+                    # merge intervals of not grouped series
+                    intervals = [ (parseDate(start), parseDate(end)) for start, end in self.connection.execute("SELECT startDate, endDate FROM coverage WHERE spec=? AND frequency=? AND options IS NULL", (spec, frequency)) ]
+                    intervals = mergeIntervals(intervals + [(parseDate(startDate), parseDate(endDate))])
+                    self.connection.execute("DELETE FROM coverage WHERE spec=? AND frequency=? AND options IS NULL", (spec, frequency))
+                    self.connection.executemany("INSERT INTO coverage VALUES (?, ?, ?, ?, NULL, ?)", [ (spec, frequency, start.isoformat(), end.isoformat(), updated) for start, end in intervals ])
+            self.stats['upserted'] += len(self.pendingPoints)
+            self.pendingPoints = list()
+            self.pendingCoverage = list()
+    # }}
+
+    # read {{
+    def missing(self, settings, measure):
+        """
+        list of (startDate, endDate) intervals of request which are not covered by stored or buffered data
+        buffer is not flushed, so checks before every request don't break batching of writes
+        """
+        startDate, endDate = parseDate(settings['startTime']), parseDate(settings['endTime'])
+        spec = specKey(settings, measure=measure)
+        frequency = settings['frequency']
+        with self.lock:
+            pending = [ row for row in self.pendingCoverage if row[0] == spec and row[1] == frequency ]
+            if settings.get('group'):
+                interval = (startDate.isoformat(), endDate.isoformat())
+                if any(row[2:4] == interval and row[4] is not None for row in pending):
+                    return list()
+                row = self.connection.execute("SELECT 1 FROM coverage WHERE spec=? AND frequency=? AND startDate=? AND endDate=? AND options IS NOT NULL", (spec, frequency) + interval).fetchone()
+                return list() if row else [(startDate, endDate)]
+            intervals = [ (parseDate(start), parseDate(end)) for start, end in self.connection.execute("SELECT startDate, endDate FROM coverage WHERE spec=? AND frequency=? AND options IS NULL", (spec, frequency)) ]
+            intervals = mergeIntervals(intervals + [ (parseDate(row[2]), parseDate(row[3])) for row in pending if row[4] is None ])
+        gaps = list()
+        cursor = startDate
+        for start, end in intervals:
+            if end < cursor:
+                continue
+            if start > endDate:
+                break
+            if start > cursor:
+                gaps.append((cursor, start - datetime.timedelta(days=1)))
+            cursor = max(cursor, end + datetime.timedelta(days=1))
+        if cursor <= endDate:
+            gaps.append((cursor, endDate))
+        return gaps
+
+    def groupTitles(self, settings, measure):
+        """
+        { option: title } of grouped request in rank order, empty for not grouped requests
+        """
+        if not settings.get('group'):
+            return dict()
+        with self.lock:
+            self.flush()
+            row = self.connection.execute("SELECT options FROM coverage WHERE spec=? AND frequency=? AND startDate=? AND endDate=? AND options IS NOT NULL", (specKey(settings, measure=measure), settings['frequency'], settings['startTime'][:10], settings['endTime'][:10])).fetchone()
+        # options stored before titles are plain keys
+        return { option: title or option for option, title in ((entry, None) if isinstance(entry, str) else entry for entry in json.loads(row[0])) } if row else dict()
+
+    def points(self, settings, measure):
+        startDate, endDate = settings['startTime'][:10], settings['endTime'][:10]
+        adamIds = [ str(adamId) for adamId in listOf(settings['adamId']) ]
+        with self.lock:
+            self.flush()
+            if settings.get('group'):
+                dimension = settings['group']['dimension']
+                options = list(self.groupTitles(settings, measure))
+            else:
+                dimension, option = filterSpec(settings)
+                options = [option]
+            rows = list()
+            for adamId in adamIds:
+                for option in options:
+                    rows += self.connection.execute("""
+                        SELECT adamId, measure, dimension, option, frequency, date, value FROM points
+                        WHERE adamId=? AND (measure=? OR substr(measure, 1, length(?)+1)=?||'.') AND dimension=? AND option=? AND frequency=? AND date BETWEEN ? AND ?
+                        ORDER BY date, measure
+                    """, (adamId, measure, measure, measure, dimension, option, settings['frequency'], startDate, endDate)).fetchall()
+        return [ Point(*row) for row in rows ]
+
+    def answer(self, settings):
+        """
+        time-series response from stored data if request is fully covered, else None
+        """
+        measures = listOf(settings['measures'])
+        if any(self.missing(settings, measure) for measure in measures):
+            self.stats['missed'] += 1
+            return None
+        self.stats['answered'] += 1
+        points = [ point for measure in measures for point in self.points(settings, measure) ]
+        titles = { option: title for measure in measures for option, title in self.groupTitles(settings, measure).items() }
+        return buildResponse(points, titles=titles, totals=len(measures) == 1 and isDerivable(measures[0]))
+
+    def timeSeriesAnalyticsResult(self, client, adamId, measures, startTime, endTime, frequency, group=None, dimensionFilters=list(), apiVersion='v1'):
+        """
+        timeSeriesAnalytics request answered from store, missing days are requested with client
+        day series are completed per missing interval, other frequencies are requested for whole interval
+        """
+
+        defName = inspect.stack()[0][3]
+        settings = {
+            'adamId': adamId,
+            'measures': measures,
+            'startTime': startTime,
+            'endTime': endTime,
+            'frequency': frequency,
+            'group': group,
+            'dimensionFilters': dimensionFilters,
+            'apiVersion': apiVersion,
+        }
+        attempts = 0
+        latency = 0.0
+        source = 'local'
+        for measure in listOf(measures):
+            gaps = self.missing(settings, measure)
+            if not gaps:
+                continue
+            source = 'network'
+            if frequency != 'day' or group:
+                gaps = [(parseDate(startTime), parseDate(endTime))]
+            else:
+                self.stats['partial'] += 1
+            for start, end in gaps:
+                self.logger.debug(f"{defName}: measure={measure}, fetching missing interval {start}..{end}")
+                result = client.timeSeriesAnalyticsResult(adamId, measure, formatDate(start), formatDate(end), frequency, group=group, dimensionFilters=dimensionFilters, apiVersion=apiVersion, localSources=False)
+                attempts += result.attempts
+                latency += result.latency
+                self.stats['fetched'] += 1
+                if not result.ok:
+                    result.settings = settings
+                    return result
+                if self not in client.sinks:
+                    self.ingest(result.settings, result.response)
+        if source == 'local':
+            self.stats['answered'] += 1
+        points = [ point for measure in listOf(measures) for point in self.points(settings, measure) ]
+        titles = { option: title for measure in listOf(measures) for option, title in self.groupTitles(settings, measure).items() }
+        # open days are stored but not covered, so freshly fetched tail is read from points too
+        data = buildResponse(points, titles=titles, totals=len(listOf(measures)) == 1 and isDerivable(listOf(measures)[0]))
+        return Result('timeSeriesAnalytics', settings, 'ok', response=data, latency=latency, attempts=attempts, source=source)
+
+    def timeSeriesAnalytics(self, client, *args, **kwargs):
+        """
+        same as timeSeriesAnalyticsResult, returns response like client.timeSeriesAnalytics
+        """
+        return self.timeSeriesAnalyticsResult(client, *args, **kwargs).legacyResponse()
+    # }}
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# offline request accounting of high level client methods against FakeSession (canned settings/all, no apple quota is used)
+# fails (exit code 1) when method sends more requests, receives more bytes or spends more cpu per request than its budget
+# example: ./requestbudget.py
+#          ./requestbudget.py --json --no-cpu
+
+import sys
+import time
+import json
+import logging
+import argparse
+import tempfile
+import pyappstoreconnect
+from pyappstoreconnect.fakeServer import FAKE_SETTINGS_ALL
+
+# init logger
+logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler()])
+logger = logging.getLogger(__name__)
+logging.getLogger('pyappstoreconnect').setLevel(logging.CRITICAL)
+
+APPLE_ID = '1000000000'
+START_TIME = '2024-09-01T00:00:00Z'
+END_TIME = '2024-09-28T00:00:00Z'
+
+# scenario: (function of client which consumes method, budget)
+# calls - maximum number of http requests (current counts, raise only on purpose), bytes - maximum response bytes,
+# cpuPerCall - maximum cpu ms per request
+SCENARIOS = {
+    'appAnalytics': (
+        lambda client: list(client.appAnalytics(APPLE_ID, startTime=START_TIME, endTime=END_TIME)),
+        { 'calls': 159, 'bytes': 2250000, 'cpuPerCall': 20 },
+    ),
+    'appAnalytics[groupsByMap]': (
+        lambda client: list(client.appAnalytics(APPLE_ID, startTime=START_TIME, endTime=END_TIME, groupsByMap={ 'pageViewUnique': 'source', 'units': 'storefront', 'proceeds': 'storefront' })),
+        { 'calls': 22, 'bytes': 85000, 'cpuPerCall': 20 },
+    ),
+    'metricsWithGroups': (
+        lambda client: list(client.metricsWithGroups(APPLE_ID, metrics=['units', 'proceeds'], groups=['source', 'storefront'], startTime=START_TIME, endTime=END_TIME)),
+        { 'calls': 4, 'bytes': 14000, 'cpuPerCall': 20 },
+    ),
+    'metricsWithAllGroups': (
+        lambda client: list(client.metricsWithAllGroups(APPLE_ID, metrics=['units'], groups=['storefront'], startTime=START_TIME, endTime=END_TIME)),
+        { 'calls': 18, 'bytes': 75000, 'cpuPerCall': 20 },
+    ),
+    'getMetricsWithFilter': (
+        lambda client: list(client.getMetricsWithFilter(APPLE_ID, metrics=['units'], filters=['source', 'platform'], startTime=START_TIME, endTime=END_TIME)),
+        { 'calls': 14, 'bytes': 24000, 'cpuPerCall': 20 },
+    ),
+    'benchmarks': (
+        lambda client: list(client.benchmarks(APPLE_ID, startTime=START_TIME, endTime=END_TIME)),
+        { 'calls': 10, 'bytes': 5000, 'cpuPerCall': 20 },
+    ),
+    'benchmarks[3 categories]': (
+        lambda client: list(client.benchmarks(APPLE_ID, startTime=START_TIME, endTime=END_TIME, category=['AllCategories', 'ProductivityApp', ["1", "2"]])),
+        { 'calls': 20, 'bytes': 11000, 'cpuPerCall': 20 },
+    ),
+    'acquisition': (
+        lambda client: client.acquisition(APPLE_ID, startTime=START_TIME, endTime=END_TIME),
+        { 'calls': 1, 'bytes': 250, 'cpuPerCall': 20 },
+    ),
+    'iterSources': (
+        lambda client: list(client.iterSources(APPLE_ID, startTime=START_TIME, endTime=END_TIME, concurrency=1)),
+        { 'calls': 3, 'bytes': 24000, 'cpuPerCall': 20 },
+    ),
+}
+
+def makeClient(server, cacheDirPath):
+    """
+    client with FakeSession, FakeServer is used only by Client() for widget key and hashcash
+    """
+    client = pyappstoreconnect.Client(cacheDirPath=cacheDirPath, appStoreConnectUrl=server.url, idmsaUrl=server.url)
+    client.session = pyappstoreconnect.FakeSession()
+    client.apiSettingsAll = FAKE_SETTINGS_ALL
+    return client
+
+def measure(client, name):
+    run, budget = SCENARIOS[name]
+    client.session.reset()
+    cpuStart = time.process_time()
+    wallStart = time.perf_counter()
+    run(client)
+    cpuTime = time.process_time() - cpuStart
+    wallTime = time.perf_counter() - wallStart
+    calls = len(client.session.calls)
+    requestBytes, responseBytes = client.session.bytes()
+    report = {
+        'method': name,
+        'calls': calls,
+        'requestBytes': requestBytes,
+        'bytes': responseBytes,
+        'cpuTime': round(cpuTime, 4),
+        'wallTime': round(wallTime, 4),
+        'cpuPerCall': round(cpuTime * 1000 / calls, 3) if calls else 0.0,
+        'budget': budget,
+    }
+    return report
+
+def check(report, cpu=True):
+    """
+    list of exceeded budgets
+    """
+    failures = list()
+    for key in ('calls', 'bytes', 'cpuPerCall'):
+        if key == 'cpuPerCall' and not cpu:
+            continue
+        if report[key] > report['budget'][key]:
+            failures.append(f"{key}={report[key]} > budget={report['budget'][key]}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='offline request accounting of client methods against FakeSession')
+    parser.add_argument('--method', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--no-cpu', action='store_true', help='do not check cpu budget (slow or busy machines)')
+    parser.add_argument('--json', action='store_true', help='print results as json')
+    args = parser.parse_args()
+
+    reports = list()
+    failed = False
+    with pyappstoreconnect.FakeServer() as server, tempfile.TemporaryDirectory() as cacheDirPath:
+        client = makeClient(server, cacheDirPath)
+        for name in args.method:
+            report = measure(client, name)
+            report['failures'] = check(report, cpu=not args.no_cpu)
+            failed = failed or bool(report['failures'])
+            reports.append(report)
+            if not args.json:
+                status = 'FAIL' if report['failures'] else 'ok'
+                logger.info(f"{status:4} {name:26} calls={report['calls']}/{report['budget']['calls']} bytes={report['bytes']}/{report['budget']['bytes']} cpuPerCall={report['cpuPerCall']}ms/{report['budget']['cpuPerCall']}ms {', '.join(report['failures'])}")
+    if args.json:
+        print(json.dumps(reports, indent=4))
+    return 1 if failed else 0
+
+## run benchmark:
+if __name__ == "__main__":
+    sys.exit(main())
@@ -58,12 +58,9 @@ def getAppAnalytics():
 # get benchmarks stat
 def getBenchmarks():
     logging.info(f"get benchmarks")
-    benchmarks = client.benchmarks(appleId, category='ProductivityApp')
+    benchmarks = client.benchmarks(appleId, category=['ProductivityApp', 'AllCategories'], concurrency=4)
     for benchmark in benchmarks:
-        logger.info(f"category=ProductivityApp, benchmark='{json.dumps(benchmark,indent=4)}'")
-    benchmarks = client.benchmarks(appleId, category='AllCategories')
-    for benchmark in benchmarks:
-        logger.info(f"categor='AllCategories', benchmark='{json.dumps(benchmark,indent=4)}'")
+        logger.info(f"category={benchmark['category']}, settings={benchmark['settings']}, benchmark='{json.dumps(benchmark['response'],indent=4)}'")
 
 # get analytics (filter replacement)
 def getAnalyticsByGroups():